@@ -0,0 +1,91 @@
+"""composite indexes
+
+Revision ID: 5d0f2b8c6a17
+Revises: c3e5a7f19b42
+Create Date: 2026-10-18 15:21:07.664190
+
+The unique index on live emails cannot be built while two live users share
+an email, which the old non-unique ix_users_email allowed. The upgrade
+stops before touching the schema and lists them; keep one row per email
+and soft-delete the rest, e.g. for each listed email:
+
+    UPDATE users SET is_deleted = 1, updated_at = NOW()
+    WHERE is_deleted = 0 AND email = '<email>' AND id <> <id to keep>;
+
+then run the upgrade again.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0f2b8c6a17'
+down_revision: Union[str, None] = 'c3e5a7f19b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Every read filters on is_deleted = 0, then sorts or filters on one more column
+COMPOSITE_INDEXES = [
+    ('ix_users_is_deleted_created_at', 'users', ['is_deleted', 'created_at']),
+    ('ix_users_is_deleted_name', 'users', ['is_deleted', 'name']),
+    ('ix_users_is_deleted_email', 'users', ['is_deleted', 'email']),
+    ('ix_users_city_id_is_deleted', 'users', ['city_id', 'is_deleted']),
+    ('ix_countries_is_deleted_created_at', 'countries', ['is_deleted', 'created_at']),
+    ('ix_countries_is_deleted_name', 'countries', ['is_deleted', 'name']),
+    ('ix_states_is_deleted_created_at', 'states', ['is_deleted', 'created_at']),
+    ('ix_states_is_deleted_name', 'states', ['is_deleted', 'name']),
+    ('ix_states_country_id_is_deleted', 'states', ['country_id', 'is_deleted']),
+    ('ix_cities_is_deleted_created_at', 'cities', ['is_deleted', 'created_at']),
+    ('ix_cities_is_deleted_name', 'cities', ['is_deleted', 'name']),
+    ('ix_cities_state_id_is_deleted', 'cities', ['state_id', 'is_deleted']),
+]
+
+# A plain UNIQUE (email, is_deleted) would allow only one deleted row per
+# email, so the unique key is on the email of live rows only.
+ACTIVE_EMAIL = sa.text('(CASE WHEN is_deleted = 0 THEN email END)')
+
+
+# emails listed when the upgrade refuses to run
+MAX_LISTED_DUPLICATES = 50
+
+
+def check_duplicate_emails():
+    # compare the way the index will: the column's own collation
+    duplicates = op.get_bind().execute(sa.text(
+        'SELECT email, COUNT(*), MIN(id) FROM users WHERE is_deleted = 0 '
+        'GROUP BY email HAVING COUNT(*) > 1 ORDER BY email'
+    )).all()
+    if not duplicates:
+        return
+    listed = "\n".join(
+        f"  {email}: {count} live rows (lowest id {first_id})"
+        for email, count, first_id in duplicates[:MAX_LISTED_DUPLICATES]
+    )
+    more = len(duplicates) - MAX_LISTED_DUPLICATES
+    if more > 0:
+        listed += f"\n  ... and {more} more"
+    raise RuntimeError(
+        f"Cannot create uq_users_active_email: {len(duplicates)} emails belong to more than one live user.\n"
+        f"{listed}\n"
+        "Soft-delete all but one row per email (see this migration's docstring) and run the upgrade again."
+    )
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        check_duplicate_emails()
+    for name, table, columns in COMPOSITE_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+    op.create_index('uq_users_active_email', 'users', [ACTIVE_EMAIL], unique=True)
+    # (is_deleted, email) answers every email lookup
+    op.drop_index('ix_users_email', table_name='users')
+
+
+def downgrade() -> None:
+    op.create_index('ix_users_email', 'users', ['email'], unique=False)
+    op.drop_index('uq_users_active_email', table_name='users')
+    for name, table, columns in reversed(COMPOSITE_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,40 @@
+"""fulltext search indexes
+
+Revision ID: ba14da701e04
+Revises: 91138e0ce5dd
+Create Date: 2026-10-18 10:12:41.508317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ba14da701e04'
+down_revision: Union[str, None] = '91138e0ce5dd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_INDEXES = [
+    ('ft_users_search', 'users', ['name', 'email']),
+    ('ft_countries_search', 'countries', ['name']),
+    ('ft_states_search', 'states', ['name']),
+    ('ft_cities_search', 'cities', ['name']),
+]
+
+
+def upgrade() -> None:
+    # ngram parser so MATCH ... AGAINST can answer infix searches like ILIKE '%x%'
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    for name, table, columns in SEARCH_INDEXES:
+        op.create_index(name, table, columns, unique=False, mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    for name, table, columns in reversed(SEARCH_INDEXES):
+        op.drop_index(name, table_name=table)
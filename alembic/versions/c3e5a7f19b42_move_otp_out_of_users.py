@@ -0,0 +1,31 @@
+"""move otp out of users
+
+Revision ID: c3e5a7f19b42
+Revises: ba14da701e04
+Create Date: 2026-10-18 14:05:19.220841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7f19b42'
+down_revision: Union[str, None] = 'ba14da701e04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # OTPs now live in the TTL store (libs/otp_store.py)
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('opt_updated_at')
+        batch_op.drop_column('otp')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('otp', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('opt_updated_at', sa.DateTime(), nullable=True))
@@ -0,0 +1,114 @@
+"""Per-route SQL query budgets, checked through the X-DB-Query-Count header.
+
+    python -m benchmarks.budgets
+
+Each route is called once to warm the principal, geography and count caches.
+The second call must stay within BUDGETS; the exit status is 1 if any route
+goes over, so a lazy load slipping into a response schema fails the run
+rather than going unnoticed. tests/test_query_budgets.py runs the same
+check under pytest through the query_budget fixture; other in-process code
+can use libs.querycount.query_budget directly.
+
+Seeds a throwaway SQLite database from benchmarks.dataset unless
+DATABASE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "budgets.db"))
+os.environ["QUERY_DEBUG"] = "true"
+
+import httpx
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+import database
+from benchmarks import dataset
+from benchmarks.routes import ROUTES, Context, route_keys
+from libs.mail_sink import start_sink
+from libs.mailer import mail_queue
+from main import app
+
+
+# statements per warm request; writes include the SELECT that loads the row.
+# Exports stream their rows after the headers are sent, so only the token
+# check shows up in the header for them. GET /users/{user_id} spends one
+# statement on its conditional GET validators before loading the user.
+BUDGETS = {
+    "GET /users": 2,
+    "GET /users/export": 1,
+    "GET /users/{user_id}": 2,
+    "POST /users": 5,
+    "POST /users/import": 3,
+    "PUT /users/{user_id}": 4,
+    "DELETE /users/{user_id}": 3,
+    "POST /login": 1,
+    "POST /forget-password": 1,
+    "POST /confirm-forget-password": 3,
+    "POST /change-password": 4,
+    "GET /countries/all": 0,
+    "POST /countries": 2,
+    "GET /countries/{country_id}": 0,
+    "GET /countries": 0,
+    "PUT /countries/{country_id}": 3,
+    "DELETE /countries/{country_id}": 3,
+    "POST /states": 4,
+    "GET /states/all": 0,
+    "GET /states/{state_id}": 0,
+    "GET /states": 0,
+    "PUT /states/{state_id}": 5,
+    "DELETE /states/{state_id}": 3,
+    "GET /cities": 0,
+    "GET /cities/export": 1,
+    "POST /cities": 5,
+    "GET /cities/all": 0,
+    "GET /cities/{city_id}": 0,
+    "PUT /cities/{city_id}": 6,
+    "DELETE /cities/{city_id}": 3,
+    "POST /geography/import": 12,
+}
+
+
+async def run(args):
+    dataset.generate(database.engine, args.scale, args.seed, reset=True)
+    FastAPICache.init(InMemoryBackend(), prefix="budgets")
+    ctx = Context()
+    sink = start_sink(port=int(os.environ["EMAIL_PORT"]))
+    over = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://budgets") as client:
+            for key in route_keys():
+                await client.request(**await ROUTES[key](ctx))
+                response = await client.request(**await ROUTES[key](ctx))
+                count = int(response.headers["x-db-query-count"])
+                budget = BUDGETS[key]
+                status = "OVER" if count > budget else "ok"
+                print(f"{status:>4}  {key:<34} {count:>3} / {budget:<3} ({response.status_code})")
+                if count > budget:
+                    over.append(key)
+    finally:
+        ctx.close()
+        mail_queue.shutdown()
+        sink.stop()
+    return over
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=0.1, help="dataset scale factor, 1 = 10k users")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    missing = [key for key in route_keys() if key not in BUDGETS]
+    if missing:
+        sys.exit(f"no query budget defined for: {', '.join(missing)}")
+    over = asyncio.run(run(args))
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
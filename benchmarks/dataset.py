@@ -0,0 +1,156 @@
+"""Deterministic synthetic data at a chosen scale factor.
+
+    python -m benchmarks.dataset --scale 100 --seed 1 --reset
+
+Scale 1 is 10k users; geography grows with it (see shape()). Users and
+cities lean towards low ids the way real traffic clusters on a few big
+cities, about 5% of every table is soft-deleted, and some deleted users
+share an email with a live account. Everything is drawn from generators
+seeded per table, so the same seed and scale give the same rows on every run.
+All seeded users share one bcrypt hash of PASSWORD, computed once.
+
+Writes to DATABASE_URL (or the DB_* settings). The tables must be empty
+unless --reset is given, which drops and recreates them from models.py.
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+import database
+import models
+from libs.utils import hash_password
+
+
+PASSWORD = "benchpass"
+DOMAINS = ["example.com", "example.org", "example.net", "mail.example.com"]
+SYLLABLES = ["ka", "ri", "to", "na", "mu", "shi", "ra", "ben", "dal", "gor", "pur", "lin", "ve", "sa", "tan", "mo"]
+EPOCH = datetime(2023, 1, 1)
+SPAN = int(timedelta(days=3 * 365).total_seconds())
+
+
+def shape(scale: float):
+    users = max(int(10000 * scale), 1)
+    cities = max(int(100 * scale), 100)
+    states = max(cities // 20, 20)
+    countries = min(max(states // 10, 5), 250)
+    return {"countries": countries, "states": states, "cities": cities, "users": users}
+
+
+def email(user_id: int):
+    return f"user{user_id}@{DOMAINS[user_id % len(DOMAINS)]}"
+
+
+def word(rng: random.Random, syllables: int):
+    return "".join(rng.choice(SYLLABLES) for _ in range(syllables)).capitalize()
+
+
+def skewed(count: int, s: float = 0.8):
+    # cumulative Zipf-like weights over ids 1..count
+    return list(itertools.accumulate(1 / rank ** s for rank in range(1, count + 1)))
+
+
+def timestamps(rng: random.Random):
+    created_at = EPOCH + timedelta(seconds=rng.randrange(SPAN))
+    return created_at, created_at + timedelta(seconds=rng.randrange(86400 * 30))
+
+
+def geo_rows(rng: random.Random, count: int, deleted_ratio: float, parent: str = None, parents: int = 0):
+    weights = skewed(parents) if parent else None
+    for row_id in range(1, count + 1):
+        created_at, updated_at = timestamps(rng)
+        row = {
+            "id": row_id,
+            "name": f"{word(rng, rng.randint(2, 3))} {row_id}",
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "is_deleted": rng.random() < deleted_ratio,
+        }
+        if parent:
+            row[parent] = rng.choices(range(1, parents + 1), cum_weights=weights)[0]
+        yield row
+
+
+def user_rows(rng: random.Random, count: int, cities: int, deleted_ratio: float, hashed_password: str):
+    weights = skewed(cities)
+    for user_id in range(1, count + 1):
+        created_at, updated_at = timestamps(rng)
+        is_deleted = rng.random() < deleted_ratio
+        address = email(user_id)
+        if is_deleted and user_id > 1 and rng.random() < 0.2:
+            # closed and re-opened accounts leave a deleted twin behind
+            address = email(rng.randint(1, user_id - 1))
+        yield {
+            "id": user_id,
+            "name": f"{word(rng, 2)} {word(rng, 3)}",
+            "email": address,
+            "dob": date(1950, 1, 1) + timedelta(days=rng.randrange(55 * 365)),
+            "password": hashed_password,
+            "city_id": rng.choices(range(1, cities + 1), cum_weights=weights)[0],
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "is_deleted": is_deleted,
+        }
+
+
+def _insert(conn, model, rows, batch_size: int):
+    total = 0
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return total
+        conn.execute(insert(model), batch)
+        total += len(batch)
+
+
+def generate(engine, scale: float = 1, seed: int = 0, deleted_ratio: float = 0.05,
+             batch_size: int = 10000, reset: bool = False):
+    if reset:
+        models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        if conn.execute(select(func.count()).select_from(models.UserModel)).scalar():
+            raise RuntimeError("users is not empty; pass reset=True (--reset) to recreate the tables")
+
+    counts = shape(scale)
+    hashed_password = hash_password(PASSWORD)
+
+    def rng(table):
+        return random.Random(f"{seed}:{table}")
+
+    with engine.begin() as conn:
+        _insert(conn, models.CountryModel, geo_rows(rng("countries"), counts["countries"], deleted_ratio), batch_size)
+        _insert(conn, models.StateModel, geo_rows(
+            rng("states"), counts["states"], deleted_ratio, "country_id", counts["countries"]
+        ), batch_size)
+        _insert(conn, models.CityModel, geo_rows(
+            rng("cities"), counts["cities"], deleted_ratio, "state_id", counts["states"]
+        ), batch_size)
+        _insert(conn, models.UserModel, user_rows(
+            rng("users"), counts["users"], counts["cities"], deleted_ratio, hashed_password
+        ), batch_size)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="1 = 10k users, 100 = 1M users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--deleted-ratio", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--reset", action="store_true", help="drop and recreate the tables first")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(database.engine, args.scale, args.seed, args.deleted_ratio, args.batch_size, args.reset)
+    elapsed = time.perf_counter() - started
+    rows = sum(counts.values())
+    print(", ".join(f"{count} {table}" for table, count in counts.items()))
+    print(f"{rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
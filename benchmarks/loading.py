@@ -0,0 +1,99 @@
+"""Per-page CPU and memory of ORM entity loading against read-only row loading.
+
+    python -m benchmarks.loading --scale 1 --limit 100 --repeat 100
+
+Each case calls a crud list function with READONLY_ROWS off (entities in the
+identity map, with their relationships eager-loaded) and on (a column-only
+SELECT built into slotted DTOs by crud.loading.RowLoader). It reports the
+median wall time per page, which includes the SQL round trips, and the peak
+memory allocated while loading one page, measured with tracemalloc. Both modes
+are checked to return the same data first.
+
+The geography cache is turned off so the geography lists reach the database.
+Runs against a throwaway SQLite file unless DATABASE_URL is set; like the
+other benchmarks it drops and reseeds the tables it is pointed at.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "loading.db"))
+os.environ["GEO_CACHE"] = "false"
+
+from pydantic import TypeAdapter
+
+import database
+from benchmarks import dataset
+from router.admin.v1 import schemas
+from router.admin.v1.crud import cities, countries, loading, states, user
+
+
+def page(fn, limit, **kwargs):
+    return lambda db: fn(db, start=0, limit=limit, search=None, sort_by="created_at", order="asc", count="none", **kwargs)
+
+
+CASES = {
+    "get_all_users": (schemas.UserList, lambda limit: page(user.get_all_users, limit, city_id=None)),
+    "get_countries": (schemas.CountryList, lambda limit: page(countries.get_countries, limit)),
+    "get_states": (schemas.StateList, lambda limit: page(states.get_states, limit)),
+    "get_cities": (schemas.CityList, lambda limit: page(cities.get_cities, limit)),
+    "get_all_states": (list[schemas.State], lambda limit: states.get_all_states),
+    "get_all_cities": (list[schemas.City], lambda limit: cities.get_all_cities),
+}
+
+
+def load(fn, readonly: bool):
+    loading.READONLY_ROWS = readonly
+    with database.Sessionlocal() as db:
+        return fn(db)
+
+
+def timed(fn, readonly: bool, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load(fn, readonly)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e3
+
+
+def peak_memory(fn, readonly: bool):
+    tracemalloc.start()
+    try:
+        load(fn, readonly)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="dataset scale factor, 1 = 10k users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=100, help="page size for the list cases")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    args = parser.parse_args()
+
+    dataset.generate(database.engine, args.scale, args.seed, reset=True)
+    print(f"{'case':<16} {'orm ms':>8} {'rows ms':>8} {'speedup':>8} {'orm KiB':>9} {'rows KiB':>9}")
+    for name in args.cases:
+        schema, case = CASES[name]
+        fn = case(args.limit)
+        adapter = TypeAdapter(schema)
+        orm, rows = (adapter.dump_python(adapter.validate_python(load(fn, ro), from_attributes=True)) for ro in (False, True))
+        if isinstance(orm, list):
+            # the /all queries have no ORDER BY
+            orm, rows = sorted(orm, key=lambda item: item["id"]), sorted(rows, key=lambda item: item["id"])
+        if orm != rows:
+            raise SystemExit(f"{name}: ORM and row loading return different data")
+        orm_ms, rows_ms = timed(fn, False, args.repeat), timed(fn, True, args.repeat)
+        orm_kib, rows_kib = peak_memory(fn, False) / 1024, peak_memory(fn, True) / 1024
+        print(f"{name:<16} {orm_ms:>8.2f} {rows_ms:>8.2f} {orm_ms / rows_ms:>7.1f}x {orm_kib:>9.0f} {rows_kib:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
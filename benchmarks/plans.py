@@ -0,0 +1,153 @@
+"""Query plans for every list/get crud function, failing on full table scans.
+
+    python -m benchmarks.plans --scale 2 --save plans.json
+
+Every statement a case emits is re-run under EXPLAIN (EXPLAIN QUERY PLAN on
+SQLite). The exit status is 1 if any of them reads a whole table instead of
+going through an index, so this can gate CI; tests/test_query_plans.py runs
+the same cases with the test suite. --save writes the captured
+plans as JSON to diff between commits.
+
+Runs against a throwaway SQLite file unless DATABASE_URL is set; like the
+other benchmarks it drops and reseeds the tables it is pointed at.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "plans.db"))
+# the geography reads must reach the database to have a plan at all
+os.environ["GEO_CACHE"] = "false"
+
+from fastapi import HTTPException
+from sqlalchemy import event
+
+import database
+import models
+from benchmarks import dataset
+from libs.utils import get_user_by_email
+from router.admin.v1.crud import cities, countries, states, user
+
+
+TABLES = set(models.Base.metadata.tables)
+
+
+def users_keyset(db, sort_by):
+    page = user.get_all_users(db, start=0, limit=10, search=None, sort_by=sort_by, order="asc", city_id=None)
+    return user.get_all_users(
+        db, start=0, limit=10, search=None, sort_by=sort_by, order="asc", city_id=None, cursor=page["next_cursor"]
+    )
+
+
+def list_case(fn, sort_by, **kwargs):
+    return lambda db: fn(db, start=0, limit=10, search=None, sort_by=sort_by, order="asc", **kwargs)
+
+
+CASES = {
+    "get_all_users created_at": list_case(user.get_all_users, "created_at", city_id=None),
+    "get_all_users name": list_case(user.get_all_users, "name", city_id=None),
+    "get_all_users email": list_case(user.get_all_users, "email", city_id=None),
+    "get_all_users city_id": list_case(user.get_all_users, "created_at", city_id=7),
+    "get_all_users keyset name": lambda db: users_keyset(db, "name"),
+    "get_user": lambda db: user.get_user(db, 42),
+    "get_user_by_email": lambda db: get_user_by_email(db, dataset.email(42)),
+    "get_countries created_at": list_case(countries.get_countries, "created_at"),
+    "get_countries name": list_case(countries.get_countries, "name"),
+    "get_country": lambda db: countries.get_country(db, 3),
+    "get_all_countries": lambda db: countries.get_all_countries(db),
+    "get_states created_at": list_case(states.get_states, "created_at"),
+    "get_states name": list_case(states.get_states, "name"),
+    "get_state": lambda db: states.get_state(db, 3),
+    "get_all_states": lambda db: states.get_all_states(db),
+    "get_cities created_at": list_case(cities.get_cities, "created_at"),
+    "get_cities name": list_case(cities.get_cities, "name"),
+    "get_city": lambda db: cities.get_city(db, 3),
+    "get_all_cities": lambda db: cities.get_all_cities(db),
+}
+
+
+def capture(fn):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        with database.Sessionlocal() as db:
+            try:
+                fn(db)
+            except HTTPException:
+                # a soft-deleted id still has a plan worth checking
+                pass
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(conn, statement, parameters):
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        plan = [row[3] for row in rows]
+        scans = []
+        for detail in plan:
+            # "SCAN users USING INDEX ..." walks an index; a bare "SCAN users" reads the table
+            match = re.match(r"SCAN (\w+)(?: AS \w+)?$", detail)
+            if match and match.group(1) in TABLES:
+                scans.append(match.group(1))
+        return plan, scans
+
+    rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all()
+    plan = [dict(row) for row in rows]
+    scans = [row["table"] for row in plan if row["type"] == "ALL" and row["table"] in TABLES]
+    return plan, scans
+
+
+def check(conn, name):
+    """EXPLAIN every SELECT case ``name`` runs: a list of {sql, plan, full_scans}."""
+    entries = []
+    for statement, parameters in capture(CASES[name]):
+        if not statement.lstrip().upper().startswith("SELECT"):
+            continue
+        plan, scans = explain(conn, statement, parameters)
+        entries.append({"sql": statement, "plan": plan, "full_scans": scans})
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=2, help="dataset scale factor, 1 = 10k users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--save", help="write the captured plans to this JSON file")
+    args = parser.parse_args()
+
+    dataset.generate(database.engine, args.scale, args.seed, reset=True)
+    if database.engine.dialect.name == "mysql":
+        with database.engine.connect() as conn:
+            for table in TABLES:
+                conn.exec_driver_sql(f"ANALYZE TABLE {table}")
+    report, failed = {}, []
+    with database.engine.connect() as conn:
+        for name in args.cases:
+            report[name] = check(conn, name)
+            for entry in report[name]:
+                if entry["full_scans"]:
+                    failed.append((name, entry["full_scans"], entry["sql"]))
+            status = "FULL SCAN" if any(entry["full_scans"] for entry in report[name]) else "ok"
+            print(f"{status:>9}  {name} ({len(report[name])} queries)")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    for name, scans, statement in failed:
+        print(f"\n{name}: full scan of {', '.join(scans)}\n{statement}", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+"""Latency percentiles and throughput for every route in router/admin/v1/api.py.
+
+    python -m benchmarks.routes --scale 1 --requests 200 --concurrency 8 --output before.json
+    python -m benchmarks.routes --scale 1 --requests 200 --concurrency 8 --compare before.json
+
+The app from main.py is driven in-process through httpx's ASGI transport. The
+Redis cache is replaced by the in-memory backend, and outbound mail goes to a
+local aiosmtpd sink. Set DB_ASYNC=true to measure the routes on AsyncSessions instead.
+Runs against a throwaway SQLite file unless DATABASE_URL is set (a local
+MySQL works too); like the other benchmarks it drops the tables and reseeds
+them from benchmarks.dataset.
+
+Each route gets its own freshly built requests, so deletes and password
+changes never hit the same row twice. Only the request itself is timed.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "routes_bench.db"))
+os.environ.setdefault("ASYNC_DATABASE_URL", os.environ["DATABASE_URL"].replace("sqlite://", "sqlite+aiosqlite://"))
+os.environ.setdefault("JWT_KEY", json.dumps({"kty": "oct", "k": "YmVuY2htYXJrLW9ubHktc2lnbmluZy1rZXktMDAwMDA"}))
+os.environ.setdefault("EMAIL_SERVER", "localhost")
+os.environ.setdefault("EMAIL_PORT", "8025")
+os.environ.setdefault("EMAIL_FROM", "bench@example.com")
+os.environ.setdefault("EMAIL_STARTTLS", "false")
+
+import httpx
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from sqlalchemy import insert, select
+
+import database
+import models
+from benchmarks import dataset
+from benchmarks.dataset import PASSWORD
+from main import app
+from libs.mail_sink import start_sink
+from libs.mailer import mail_queue
+from libs.otp_store import otp_store
+from router.admin.v1 import api
+from router.admin.v1.crud.user import get_token
+
+
+OTP = "123456"
+
+
+class Context:
+    def __init__(self):
+        self.db = database.Sessionlocal()
+        # requests only target live rows, so a soft-deleted id never turns into a 404
+        self.live = {
+            model: self.db.scalars(select(model.id).where(model.is_deleted == False).order_by(model.id)).all()
+            for model in (models.UserModel, models.CountryModel, models.StateModel, models.CityModel)
+        }
+        self.hashed_password = self.db.scalar(select(models.UserModel.password).limit(1))
+        admin = self.pick(models.UserModel)
+        self.headers = {"token": get_token(admin, dataset.email(admin))}
+        self.seq = 0
+
+    def next(self):
+        self.seq += 1
+        return self.seq
+
+    def insert(self, model, **values):
+        row_id = self.db.execute(insert(model).values(**values)).inserted_primary_key[0]
+        self.db.commit()
+        return row_id
+
+    def new_user(self):
+        email = f"bench{self.next()}@example.com"
+        user_id = self.insert(models.UserModel, name="Bench", email=email, password=self.hashed_password, city_id=1)
+        return user_id, email
+
+    def pick(self, model):
+        return random.choice(self.live[model])
+
+    def user_id(self):
+        return self.pick(models.UserModel)
+
+    def city_id(self):
+        return self.pick(models.CityModel)
+
+    def state_id(self):
+        return self.pick(models.StateModel)
+
+    def country_id(self):
+        return self.pick(models.CountryModel)
+
+    def close(self):
+        self.db.close()
+
+
+def get(url):
+    async def build(ctx):
+        return {"method": "GET", "url": url(ctx) if callable(url) else url, "headers": ctx.headers}
+    return build
+
+
+async def create_user(ctx):
+    return {"method": "POST", "url": "/users", "json": {
+        "name": "Bench", "email": f"bench{ctx.next()}@example.com", "dob": "1990-01-01",
+        "password": PASSWORD, "city_id": ctx.city_id(),
+    }}
+
+
+async def import_users(ctx):
+    lines = ["name,email,dob,password,city_id"] + [
+        f"Bench,bench{ctx.next()}@example.com,1990-01-01,{PASSWORD},{ctx.city_id()}" for _ in range(10)
+    ]
+    return {"method": "POST", "url": "/users/import", "content": "\n".join(lines),
+            "headers": {**ctx.headers, "content-type": "text/csv"}}
+
+
+async def update_user(ctx):
+    return {"method": "PUT", "url": f"/users/{ctx.user_id()}", "headers": ctx.headers,
+            "json": {"name": f"User {ctx.next()}", "dob": "1990-01-01", "city_id": ctx.city_id()}}
+
+
+async def delete_user(ctx):
+    user_id, _ = ctx.new_user()
+    return {"method": "DELETE", "url": f"/users/{user_id}", "headers": ctx.headers}
+
+
+async def login(ctx):
+    return {"method": "POST", "url": "/login", "json": {"email": dataset.email(ctx.user_id()), "password": PASSWORD}}
+
+
+async def forget_password(ctx):
+    return {"method": "POST", "url": "/forget-password", "json": {"email": dataset.email(ctx.user_id())}}
+
+
+async def confirm_forget_password(ctx):
+    _, email = ctx.new_user()
+    await otp_store.issue(email, OTP)
+    return {"method": "POST", "url": "/confirm-forget-password", "json": {"email": email, "otp": OTP, "password": PASSWORD}}
+
+
+async def change_password(ctx):
+    user_id, email = ctx.new_user()
+    return {"method": "POST", "url": "/change-password", "headers": {"token": get_token(user_id, email)},
+            "json": {"old_password": PASSWORD, "new_password": PASSWORD + "2"}}
+
+
+def create_geo(url, **parent):
+    async def build(ctx):
+        body = {"name": f"Bench {ctx.next()}", **{key: value(ctx) for key, value in parent.items()}}
+        return {"method": "POST", "url": url, "headers": ctx.headers, "json": body}
+    return build
+
+
+def update_geo(url, model, **parent):
+    async def build(ctx):
+        body = {"name": f"Bench {ctx.next()}", **{key: value(ctx) for key, value in parent.items()}}
+        return {"method": "PUT", "url": url.format(ctx.pick(model)), "headers": ctx.headers, "json": body}
+    return build
+
+
+def delete_geo(url, model, **parent):
+    async def build(ctx):
+        row_id = ctx.insert(model, name=f"Bench {ctx.next()}", **parent)
+        return {"method": "DELETE", "url": url.format(row_id), "headers": ctx.headers}
+    return build
+
+
+async def import_geography(ctx):
+    seq = ctx.next()
+    lines = ["country\tstate\tcity"] + [f"Bench {seq}\tState {seq}\tCity {seq}-{i}" for i in range(10)]
+    return {"method": "POST", "url": "/geography/import?mode=upsert", "content": "\n".join(lines),
+            "headers": {**ctx.headers, "content-type": "text/tab-separated-values"}}
+
+
+ROUTES = {
+    "GET /users": get("/users?limit=10"),
+    "GET /users/export": get(lambda ctx: f"/users/export?city_id={ctx.city_id()}"),
+    "GET /users/{user_id}": get(lambda ctx: f"/users/{ctx.user_id()}"),
+    "POST /users": create_user,
+    "POST /users/import": import_users,
+    "PUT /users/{user_id}": update_user,
+    "DELETE /users/{user_id}": delete_user,
+    "POST /login": login,
+    "POST /forget-password": forget_password,
+    "POST /confirm-forget-password": confirm_forget_password,
+    "POST /change-password": change_password,
+    "GET /countries/all": get("/countries/all"),
+    "POST /countries": create_geo("/countries"),
+    "GET /countries/{country_id}": get(lambda ctx: f"/countries/{ctx.country_id()}"),
+    "GET /countries": get("/countries?limit=10"),
+    "PUT /countries/{country_id}": update_geo("/countries/{}", models.CountryModel),
+    "DELETE /countries/{country_id}": delete_geo("/countries/{}", models.CountryModel),
+    "POST /states": create_geo("/states", country_id=Context.country_id),
+    "GET /states/all": get("/states/all"),
+    "GET /states/{state_id}": get(lambda ctx: f"/states/{ctx.state_id()}"),
+    "GET /states": get("/states?limit=10"),
+    "PUT /states/{state_id}": update_geo("/states/{}", models.StateModel, country_id=Context.country_id),
+    "DELETE /states/{state_id}": delete_geo("/states/{}", models.StateModel),
+    "GET /cities": get("/cities?limit=10"),
+    "GET /cities/export": get("/cities/export"),
+    "POST /cities": create_geo("/cities", state_id=Context.state_id),
+    "GET /cities/all": get("/cities/all"),
+    "GET /cities/{city_id}": get(lambda ctx: f"/cities/{ctx.city_id()}"),
+    "PUT /cities/{city_id}": update_geo("/cities/{}", models.CityModel, state_id=Context.state_id),
+    "DELETE /cities/{city_id}": delete_geo("/cities/{}", models.CityModel),
+    "POST /geography/import": import_geography,
+}
+
+
+def route_keys():
+    # slow-query and profile inspection are for operators, not part of the API being measured
+    return [
+        f"{method} {route.path}" for route in api.router.routes
+        if "Diagnostics" not in route.tags for method in sorted(route.methods)
+    ]
+
+
+def percentile(values: list, pct: float):
+    # nearest-rank, so p99 of 100 samples is the slowest but one
+    return values[max(math.ceil(pct / 100 * len(values)) - 1, 0)]
+
+
+async def measure(client, ctx, build, warmup: int, requests: int, concurrency: int):
+    built = [await build(ctx) for _ in range(warmup + requests)]
+    for request in built[:warmup]:
+        await client.request(**request)
+
+    latencies, statuses = [], Counter()
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(request):
+        async with limit:
+            started = time.perf_counter()
+            response = await client.request(**request)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(request) for request in built[warmup:]))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": sum(count for status, count in statuses.items() if status >= 400),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "rps": round(requests / elapsed, 1),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(new, old, higher_is_better=False):
+    if not old:
+        return ""
+    delta = (new - old) / old * 100
+    better = delta > 0 if higher_is_better else delta < 0
+    return f"{delta:+6.1f}%{'' if abs(delta) < 5 else (' +' if better else ' -')}"
+
+
+def print_results(results: dict, baseline: dict = None):
+    previous = (baseline or {}).get("routes", {})
+    print(f"{'route':<34} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8} {'errors':>6}")
+    for key, result in results["routes"].items():
+        line = (
+            f"{key:<34} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+            f"{result['rps']:>8.1f} {result['errors']:>6}"
+        )
+        old = previous.get(key)
+        if old:
+            line += (
+                f"   p50 {change(result['p50_ms'], old['p50_ms'])}  p99 {change(result['p99_ms'], old['p99_ms'])}"
+                f"  rps {change(result['rps'], old['rps'], higher_is_better=True)}"
+            )
+        print(line)
+
+
+async def run(args):
+    counts = dataset.generate(database.engine, args.scale, args.seed, reset=True)
+    FastAPICache.init(InMemoryBackend(), prefix="bench")
+    ctx = Context()
+    sink = start_sink(port=int(os.environ["EMAIL_PORT"]))
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "database": database.engine.dialect.name,
+            "db_async": database.DB_ASYNC,
+            "scale": args.scale,
+            "seed": args.seed,
+            **counts,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+        },
+        "routes": {},
+    }
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for key in route_keys():
+                if args.routes and not any(pattern in key for pattern in args.routes):
+                    continue
+                results["routes"][key] = await measure(
+                    client, ctx, ROUTES[key], args.warmup, args.requests, args.concurrency
+                )
+                print(f"  {key}", file=sys.stderr)
+    finally:
+        ctx.close()
+        mail_queue.shutdown()
+        sink.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="dataset scale factor, 1 = 10k users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=100, help="timed requests per route")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--routes", nargs="+", help="only routes whose 'METHOD /path' contains one of these")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="results JSON from an earlier run to diff against")
+    args = parser.parse_args()
+
+    missing = [key for key in route_keys() if key not in ROUTES]
+    if missing:
+        sys.exit(f"no benchmark defined for: {', '.join(missing)}")
+
+    random.seed(0)
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Search latency against table size for each search backend.
+
+    python -m benchmarks.search --sizes 1000 10000 100000 --backends like trigram
+
+Runs against a throwaway SQLite file unless DATABASE_URL is set (point it
+at a migrated MySQL database to include the fulltext backend).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "search_bench.db"))
+
+import database
+import models
+from libs import search
+from router.admin.v1.crud import user
+
+
+WORDS = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def seed(size: int):
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+    rng = random.Random(size)
+    with database.engine.begin() as conn:
+        conn.execute(models.CountryModel.__table__.insert(), [{"id": 1, "name": "Country", "is_deleted": False}])
+        conn.execute(models.StateModel.__table__.insert(), [{"id": 1, "name": "State", "country_id": 1, "is_deleted": False}])
+        conn.execute(models.CityModel.__table__.insert(), [{"id": 1, "name": "City", "state_id": 1, "is_deleted": False}])
+        rows = [
+            {
+                "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+                "email": f"user{i}@{rng.choice(WORDS)}.example",
+                "password": "x",
+                "city_id": 1,
+                "is_deleted": False,
+            }
+            for i in range(size)
+        ]
+        for offset in range(0, size, 10000):
+            conn.execute(models.UserModel.__table__.insert(), rows[offset:offset + 10000])
+
+
+def measure(backend: str, term: str, repeat: int, sort_by: str):
+    search.SEARCH_BACKEND = backend
+    search._indexes.clear()
+    timings = []
+    with database.Sessionlocal() as db:
+        # first call pays for building the in-process index
+        matches = user.get_all_users(db, start=0, limit=10, search=term, sort_by=sort_by, order="asc", city_id=None)["count"]
+        for _ in range(repeat):
+            started = time.perf_counter()
+            user.get_all_users(db, start=0, limit=10, search=term, sort_by=sort_by, order="asc", city_id=None)
+            timings.append((time.perf_counter() - started) * 1000)
+    return matches, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--backends", nargs="+", default=["like", "trigram"])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sort-by", default="created_at", choices=["created_at", "name", "relevance"])
+    args = parser.parse_args()
+
+    # a mix of selective (user12, 4711) and unselective (harl, @golf) terms
+    terms = ["harl", "delta echo", "user12", "4711", "@golf"]
+    print(f"{'rows':>8} {'term':>12} {'matches':>8} " + " ".join(f"{backend + ' ms':>12}" for backend in args.backends))
+    for size in args.sizes:
+        seed(size)
+        for term in terms:
+            results = [measure(backend, term, args.repeat, args.sort_by) for backend in args.backends]
+            timings = " ".join(f"{median:>12.2f}" for _, median in results)
+            print(f"{size:>8} {term:>12} {results[0][0]:>8} {timings}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Response serialization cost: FastAPI's response_model path against libs.fastjson.
+
+    python -m benchmarks.serialization --scale 1 --limit 100 --repeat 200
+
+Each case loads one page (or /all list) through the crud layer once, then
+times only turning it into response bytes:
+
+  validated  what FastAPI does for a route with response_model: validate the
+             ORM objects into the schema, dump them to JSON-able data, then
+             json.dumps in JSONResponse.render
+  fast       libs.fastjson with FAST_JSON on: read the schema's fields
+             straight off the rows and render with orjson
+
+Both outputs are checked to decode to the same JSON before timing. For the
+end-to-end effect run benchmarks.routes with --output, then again with
+FAST_JSON=true and --compare.
+
+Runs against a throwaway SQLite file unless DATABASE_URL is set; like the
+other benchmarks it drops and reseeds the tables it is pointed at.
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "serialization.db"))
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.utils import create_model_field
+
+import database
+from benchmarks import dataset
+from libs.fastjson import serializer
+from router.admin.v1 import schemas
+from router.admin.v1.crud import cities, countries, states, user
+
+
+def page(fn, limit, **kwargs):
+    return lambda db: fn(db, start=0, limit=limit, search=None, sort_by="created_at", order="asc", **kwargs)
+
+
+CASES = {
+    "GET /users": (schemas.UserList, lambda limit: page(user.get_all_users, limit, city_id=None)),
+    "GET /users/{user_id}": (schemas.User, lambda limit: lambda db: user.get_user(db, 42)),
+    "GET /countries": (schemas.CountryList, lambda limit: page(countries.get_countries, limit)),
+    "GET /states": (schemas.StateList, lambda limit: page(states.get_states, limit)),
+    "GET /cities": (schemas.CityList, lambda limit: page(cities.get_cities, limit)),
+    "GET /states/all": (list[schemas.State], lambda limit: states.get_all_states),
+    "GET /cities/all": (list[schemas.City], lambda limit: cities.get_all_cities),
+}
+
+
+def validated(schema):
+    field = create_model_field("response", schema, mode="serialization")
+
+    def render(data):
+        value, errors = field.validate(data, {}, loc=("response",))
+        assert not errors, errors
+        return JSONResponse(field.serialize(value, mode="json")).body
+
+    return render
+
+
+def fast(schema):
+    convert = serializer(schema)
+    return lambda data: ORJSONResponse(convert(data)).body
+
+
+def timed(render, data, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(data)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=float, default=1, help="dataset scale factor, 1 = 10k users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--limit", type=int, default=100, help="page size for the list cases")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    args = parser.parse_args()
+
+    dataset.generate(database.engine, args.scale, args.seed, reset=True)
+    print(f"{'case':<24} {'validated us':>13} {'fast us':>10} {'speedup':>8} {'bytes':>9}")
+    with database.Sessionlocal() as db:
+        for name in args.cases:
+            schema, load = CASES[name]
+            data = load(args.limit)(db)
+            slow_render, fast_render = validated(schema), fast(schema)
+            body = fast_render(data)
+            if json.loads(body) != json.loads(slow_render(data)):
+                raise SystemExit(f"{name}: fast and validated output differ")
+            slow_us = timed(slow_render, data, args.repeat)
+            fast_us = timed(fast_render, data, args.repeat)
+            print(f"{name:<24} {slow_us:>13.1f} {fast_us:>10.1f} {slow_us / fast_us:>7.1f}x {len(body):>9}")
+
+
+if __name__ == "__main__":
+    main()
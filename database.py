@@ -1,16 +1,21 @@
+import itertools
 import os
+import threading
+import time
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError, TimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-DATABASE_URL = (
-    "mysql+pymysql://"
-    + os.getenv("DB_USER", "root")
+DB_LOCATION = (
+    os.getenv("DB_USER", "root")
     + ":"
     + os.getenv("DB_PASS", "root")
     + "@"
@@ -18,8 +23,163 @@ DATABASE_URL = (
     + "/"
     + os.getenv("DB_NAME", "fast_crud_db")
 )
-engine = create_engine(DATABASE_URL, pool_size = 10, max_overflow = 30)
+DATABASE_URL = os.getenv("DATABASE_URL") or "mysql+pymysql://" + DB_LOCATION
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or "mysql+aiomysql://" + DB_LOCATION
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() == "true"
+# comma separated; reads from ReadSessionlocal sessions are spread over these
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+ASYNC_REPLICA_URLS = [url.strip() for url in os.getenv("ASYNC_DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_EJECT_SECONDS = float(os.getenv("REPLICA_EJECT_SECONDS", "30"))
 
-Sessionlocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# per engine and per worker process; see config.template.py
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "30")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+}
+
+
+class CheckoutTimer:
+    """Pool mixin that reports how long each checkout waited for a connection.
+
+    Observers are called with the pool, the wait in seconds and whether the
+    checkout gave up after pool_timeout.
+    """
+
+    observers = []
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            for observe in self.observers:
+                observe(self, waited, timed_out)
+
+
+class TimedQueuePool(CheckoutTimer, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(CheckoutTimer, AsyncAdaptedQueuePool):
+    pass
+
+
+class ReplicaSet:
+    """Round-robin over replica engines, skipping any that failed in the last REPLICA_EJECT_SECONDS."""
+
+    def __init__(self, engines):
+        self.engines = [getattr(engine, "sync_engine", engine) for engine in engines]
+        self.down_until = {}
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        for engine in self.engines:
+            event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context):
+        if context.is_disconnect or isinstance(context.sqlalchemy_exception, OperationalError):
+            self.eject(context.engine)
+
+    def eject(self, engine):
+        with self.lock:
+            self.down_until[engine] = time.monotonic() + REPLICA_EJECT_SECONDS
+
+    def pick(self):
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            for _ in range(len(self.engines)):
+                engine = self.engines[next(self.counter) % len(self.engines)]
+                if self.down_until.get(engine, 0) <= now:
+                    return engine
+        # every replica is down, the primary serves the reads
+        return None
+
+    def status(self):
+        now = time.monotonic()
+        with self.lock:
+            return [
+                {
+                    "url": engine.url.render_as_string(hide_password=True),
+                    "healthy": self.down_until.get(engine, 0) <= now,
+                    "ejected_for": max(round(self.down_until.get(engine, 0) - now, 1), 0),
+                }
+                for engine in self.engines
+            ]
+
+
+class RoutingSession(Session):
+    """Sends the reads of sessions opened with ``info={"replica": True}`` to a replica.
+
+    Flushes always go to the primary, and a session that has flushed stays on
+    the primary from then on so it reads its own writes.
+    """
+
+    replicas = None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("replica") and not self._flushing and not self.info.get("primary"):
+            replica = self.info.get("replica_engine") or self.replicas.pick()
+            if replica is not None:
+                self.info["replica_engine"] = replica
+                return replica
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+def pin_to_primary(session):
+    """Send the rest of ``session``'s reads to the primary.
+
+    Also called before filling a process-wide cache (principals, geography,
+    counts, search): a write has usually just invalidated it, and a lagging
+    replica would put the old rows back for the whole TTL.
+    """
+    session = getattr(session, "sync_session", session)
+    session.info["primary"] = True
+    session.info.pop("replica_engine", None)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _pin_after_flush(session, flush_context):
+    pin_to_primary(session)
+
+
+engine = create_engine(DATABASE_URL, poolclass=TimedQueuePool, **POOL_OPTIONS)
+replicas = ReplicaSet([
+    create_engine(url, poolclass=TimedQueuePool, **POOL_OPTIONS) for url in REPLICA_URLS
+])
+RoutingSession.replicas = replicas
+
+Sessionlocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+ReadSessionlocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine, info={"replica": True})
+
+async_engine = None
+async_replicas = ReplicaSet([])
+AsyncSessionlocal = None
+AsyncReadSessionlocal = None
+if DB_ASYNC:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=TimedAsyncQueuePool, **POOL_OPTIONS)
+    async_replicas = ReplicaSet([
+        create_async_engine(url, poolclass=TimedAsyncQueuePool, **POOL_OPTIONS)
+        for url in ASYNC_REPLICA_URLS
+    ])
+
+    class AsyncRoutingSession(RoutingSession):
+        replicas = async_replicas
+
+    AsyncSessionlocal = async_sessionmaker(
+        bind=async_engine, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False
+    )
+    AsyncReadSessionlocal = async_sessionmaker(
+        bind=async_engine, sync_session_class=AsyncRoutingSession, autoflush=False, expire_on_commit=False,
+        info={"replica": True}
+    )
 
 Base = declarative_base()
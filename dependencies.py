@@ -1,4 +1,4 @@
-from database import  Sessionlocal
+from database import  Sessionlocal, ReadSessionlocal, AsyncSessionlocal, AsyncReadSessionlocal, DB_ASYNC
 
 
 def get_db():
@@ -8,3 +8,27 @@ def get_db():
 
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionlocal()
+    try:
+        yield db
+
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionlocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionlocal() as db:
+        yield db
+
+
+# what the router's handlers get: AsyncSessions under DB_ASYNC, Sessions otherwise
+get_session = get_async_db if DB_ASYNC else get_db
+get_read_session = get_async_read_db if DB_ASYNC else get_read_db
@@ -0,0 +1,90 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import lru_cache
+
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+
+@lru_cache(maxsize=None)
+def _schema_salt(schema):
+    # a change to the response shape must not match ETags handed out before it
+    return json.dumps(TypeAdapter(schema).json_schema(), sort_keys=True)
+
+
+def _utc(value: datetime):
+    # updated_at is stored naive, in the server's local time
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def table_versions(db: Session, *models):
+    """count(*) and max(updated_at) for each model's table in one round trip.
+
+    Soft-deleted rows are included: deletes bump updated_at like any other write.
+    """
+    columns = []
+    for model in models:
+        columns.append(select(func.count()).select_from(model).scalar_subquery())
+        columns.append(select(func.max(model.updated_at)).scalar_subquery())
+    return tuple(db.execute(select(*columns)).one())
+
+
+class Validators:
+    """ETag and Last-Modified for a response body described by ``version``.
+
+    ``version`` is a tuple of cheap facts that change whenever the body does
+    (timestamps and row counts); the body itself is never built to hash it.
+    """
+
+    __slots__ = ("etag", "last_modified")
+
+    def __init__(self, schema, version: tuple):
+        digest = hashlib.blake2b(repr((_schema_salt(schema), version)).encode(), digest_size=16).hexdigest()
+        self.etag = f'W/"{digest}"'
+        stamps = [value for value in version if isinstance(value, datetime)]
+        self.last_modified = _utc(max(stamps)) if stamps else None
+
+    @property
+    def headers(self):
+        headers = {"ETag": self.etag}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def fresh(self, request: Request):
+        # If-None-Match wins over If-Modified-Since when both are sent (RFC 9110 13.2.2)
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or self.etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return self.last_modified <= since
+
+
+def conditional(request: Request, response: Response, schema, version):
+    """Answer a conditional GET from ``version`` before the body is loaded.
+
+    Returns a 304 when the client's copy is current. Otherwise the validators
+    go on ``response`` (pass ``response.headers`` on to fast_json) and None is
+    returned. A None ``version`` means the row is missing; the handler's own
+    lookup then raises the 404.
+    """
+    if version is None:
+        return None
+    validators = Validators(schema, version)
+    if validators.fresh(request):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers)
+    response.headers.update(validators.headers)
+    return None
@@ -0,0 +1,82 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from dotenv import load_dotenv
+
+from database import pin_to_primary
+
+load_dotenv()
+
+
+COUNT_STRATEGIES = ["exact", "cached", "estimated", "window", "none"]
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "60"))
+COUNT_CACHE_SIZE = int(os.getenv("COUNT_CACHE_SIZE", "1000"))
+
+# LRU of (table, sql, params) -> (expires_at, total); keys carry the user's filters
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def invalidate_counts(table: str):
+    with _lock:
+        for key in [key for key in _cache if key[0] == table]:
+            del _cache[key]
+
+
+def exact_count(query):
+    return query.order_by(None).count()
+
+
+def cached_count(query, model):
+    compiled = query.statement.compile()
+    key = (model.__tablename__, str(compiled), tuple(sorted(compiled.params.items())))
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            if hit[0] > time.monotonic():
+                _cache.move_to_end(key)
+                return hit[1]
+            del _cache[key]
+
+    pin_to_primary(query.session)
+    total = exact_count(query)
+    if COUNT_CACHE_SIZE <= 0:
+        return total
+    now = time.monotonic()
+    with _lock:
+        _cache[key] = (now + COUNT_CACHE_TTL, total)
+        _cache.move_to_end(key)
+        # least recently used first: drop expired entries from the front, then any over the limit
+        while _cache:
+            oldest_key, (expires_at, _) = next(iter(_cache.items()))
+            if expires_at > now and len(_cache) <= COUNT_CACHE_SIZE:
+                break
+            del _cache[oldest_key]
+    return total
+
+
+def estimated_count(query, model, filtered: bool):
+    db = query.session
+    if filtered or db.get_bind().dialect.name != "mysql":
+        return cached_count(query, model)
+    total = db.execute(
+        text(
+            "SELECT TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ),
+        {"table": model.__tablename__},
+    ).scalar()
+    return int(total or 0)
+
+
+def count_rows(query, model, strategy: str, filtered: bool = False):
+    if strategy == "none":
+        return None
+    if strategy == "cached":
+        return cached_count(query, model)
+    if strategy == "estimated":
+        return estimated_count(query, model, filtered)
+    return exact_count(query)
@@ -0,0 +1,60 @@
+import csv
+import io
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EXPORT_FORMATS = ["ndjson", "csv"]
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def export_query(query, batch_size: int = EXPORT_BATCH_SIZE):
+    # yield_per turns on stream_results, so the driver uses a server-side cursor
+    return query.yield_per(batch_size)
+
+
+def related(*names):
+    """A CSV column getter for ``row.a.b...``; None once a nullable link is missing.
+
+    The headers are sent before the first row, so an AttributeError there
+    would cut the file off instead of failing the request.
+    """
+    def get(row):
+        for name in names:
+            if row is None:
+                return None
+            row = getattr(row, name)
+        return row
+    return get
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_rows(rows, fmt: str, schema, columns: dict, batch_size: int = EXPORT_BATCH_SIZE):
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns.keys())
+        for batch in _batches(rows, batch_size):
+            writer.writerows([getter(row) for getter in columns.values()] for row in batch)
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+        return
+
+    for batch in _batches(rows, batch_size):
+        yield "".join(schema.model_validate(row).model_dump_json() + "\n" for row in batch).encode()
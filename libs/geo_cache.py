@@ -0,0 +1,301 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from database import engine, pin_to_primary
+from models import CountryModel, StateModel, CityModel
+from libs.pagination import encode_cursor, decode_cursor
+
+load_dotenv()
+
+
+GEO_CACHE = os.getenv("GEO_CACHE", "true").lower() == "true"
+GEO_CACHE_TTL = int(os.getenv("GEO_CACHE_TTL", "300"))
+
+
+@dataclass(slots=True, frozen=True)
+class CountryRow:
+    id: int
+    name: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    is_deleted: bool
+
+
+@dataclass(slots=True, frozen=True)
+class StateRow:
+    id: int
+    name: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    is_deleted: bool
+    country_id: Optional[int]
+    country: Optional[CountryRow]
+
+
+@dataclass(slots=True, frozen=True)
+class CityRow:
+    id: int
+    name: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    is_deleted: bool
+    state_id: Optional[int]
+    state: Optional[StateRow]
+
+
+# Name order has to match ORDER BY name on the primary, or a cursor handed out
+# by one path skips or repeats rows on the other (cache off, or across a TTL
+# reload). SQLite's BINARY collation compares code points like str does; MySQL's
+# default _ci collations ignore case, which casefold matches for ASCII names.
+# Accented names can still order differently there, as utf8mb4_0900_ai_ci
+# also ignores accents.
+if engine.dialect.name == "sqlite":
+    _name_key = lambda value, row_id: (value, row_id)
+else:
+    _name_key = lambda value, row_id: (value.casefold(), row_id)
+
+SORT_KEYS = {
+    "created_at": lambda value, row_id: (value is not None, value or datetime.min, row_id),
+    "name": _name_key,
+    "id": lambda value, row_id: (row_id,),
+}
+
+
+def sort_value(row, sort_by: str):
+    return None if sort_by == "id" else getattr(row, sort_by)
+
+
+class Table:
+    """Rows by id plus every SORT_KEYS ordering of the live ones.
+
+    Never changed once built: a write makes a new Table with ``replace``,
+    so readers iterating the old one see a consistent snapshot.
+    """
+
+    __slots__ = ("rows", "orderings", "version")
+
+    def __init__(self, rows: dict, orderings: dict = None, version: tuple = None):
+        self.rows = rows
+        if orderings is None:
+            orderings = {}
+            live = [row for row in rows.values() if not row.is_deleted]
+            for sort_by, key in SORT_KEYS.items():
+                keyed = sorted((key(sort_value(row, sort_by), row.id), row) for row in live)
+                orderings[sort_by] = ([row for _, row in keyed], [key for key, _ in keyed])
+        self.orderings = orderings
+        # the same facts as libs.conditional.table_versions, without the query
+        if version is None:
+            version = (len(rows), max((row.updated_at for row in rows.values() if row.updated_at), default=None))
+        self.version = version
+
+    def replace(self, changed: list):
+        """A new Table with ``changed`` rows swapped in by id, each placed with bisect."""
+        if not changed:
+            return self
+        rows = dict(self.rows)
+        orderings = {sort_by: (list(ordered), list(keys)) for sort_by, (ordered, keys) in self.orderings.items()}
+        updated_at = self.version[1]
+        for row in changed:
+            old = rows.get(row.id)
+            rows[row.id] = row
+            if row.updated_at and (updated_at is None or row.updated_at > updated_at):
+                updated_at = row.updated_at
+            for sort_by, key in SORT_KEYS.items():
+                ordered, keys = orderings[sort_by]
+                old_key = None if old is None or old.is_deleted else key(sort_value(old, sort_by), old.id)
+                new_key = None if row.is_deleted else key(sort_value(row, sort_by), row.id)
+                if old_key is not None:
+                    index = bisect_left(keys, old_key)
+                    if old_key == new_key:
+                        # same position, e.g. a city whose state was renamed
+                        ordered[index] = row
+                        continue
+                    del ordered[index], keys[index]
+                if new_key is not None:
+                    index = bisect_left(keys, new_key)
+                    ordered.insert(index, row)
+                    keys.insert(index, new_key)
+        return Table(rows, orderings, (len(rows), updated_at))
+
+
+class GeoCache:
+    """Process-local snapshot of countries, states and cities.
+
+    Loaded in three queries, refreshed write-through by the crud modules
+    and reloaded after GEO_CACHE_TTL to pick up other workers' writes.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.tables = None
+        self.loaded_at = 0
+        self.lock = threading.RLock()
+
+    def invalidate(self):
+        with self.lock:
+            self.tables = None
+
+    def load(self, db: Session):
+        countries = {
+            row.id: CountryRow(row.id, row.name, row.created_at, row.updated_at, bool(row.is_deleted))
+            for row in db.execute(select(
+                CountryModel.id, CountryModel.name, CountryModel.created_at, CountryModel.updated_at, CountryModel.is_deleted
+            ))
+        }
+        states = {
+            row.id: StateRow(
+                row.id, row.name, row.created_at, row.updated_at, bool(row.is_deleted),
+                row.country_id, countries.get(row.country_id)
+            )
+            for row in db.execute(select(
+                StateModel.id, StateModel.name, StateModel.created_at, StateModel.updated_at, StateModel.is_deleted, StateModel.country_id
+            ))
+        }
+        cities = {
+            row.id: CityRow(
+                row.id, row.name, row.created_at, row.updated_at, bool(row.is_deleted),
+                row.state_id, states.get(row.state_id)
+            )
+            for row in db.execute(select(
+                CityModel.id, CityModel.name, CityModel.created_at, CityModel.updated_at, CityModel.is_deleted, CityModel.state_id
+            ))
+        }
+        return {"countries": Table(countries), "states": Table(states), "cities": Table(cities)}
+
+    def snapshot(self, db: Session):
+        tables = self.tables
+        if tables is not None and time.monotonic() - self.loaded_at < self.ttl:
+            return tables
+        with self.lock:
+            if self.tables is None or time.monotonic() - self.loaded_at >= self.ttl:
+                pin_to_primary(db)
+                self.tables = self.load(db)
+                self.loaded_at = time.monotonic()
+            return self.tables
+
+    def get(self, db: Session, table: str, row_id: int):
+        row = self.snapshot(db)[table].rows.get(row_id)
+        if row is None or row.is_deleted:
+            return None
+        return row
+
+    def version(self, db: Session, *tables: str):
+        snapshot = self.snapshot(db)
+        return tuple(value for table in tables for value in snapshot[table].version)
+
+    def all(self, db: Session, table: str):
+        return list(self.snapshot(db)[table].orderings["id"][0])
+
+    def list(
+        self,
+        db: Session,
+        table: str,
+        start: int,
+        limit: int,
+        search: str,
+        sort_by: str,
+        order: str,
+        cursor: str = None,
+        count: str = "exact",
+    ):
+        key_name = sort_by if sort_by in ("created_at", "name") else "id"
+        ordered, keys = self.snapshot(db)[table].orderings[key_name]
+        desc = order == "desc"
+        term = search.casefold() if search else None
+
+        def matches(row):
+            return term is None or term in row.name.casefold()
+
+        if sort_by == "relevance" and term is not None:
+            if cursor:
+                raise HTTPException(status_code=400, detail=f"Cursor pagination is not supported for sort_by={sort_by}")
+            found = [row for row in ordered if matches(row)]
+            found.sort(key=lambda row: (row.name.casefold().find(term), len(row.name), row.id), reverse=desc)
+            total = None if count == "none" else len(found)
+            return {"data": found[start:start + limit], "count": total, "next_cursor": None}
+
+        if cursor:
+            value, row_id = decode_cursor(cursor, sort_by, order)
+            probe = SORT_KEYS[key_name](value, row_id)
+            if desc:
+                candidates = reversed(ordered[:bisect_left(keys, probe)])
+            else:
+                candidates = ordered[bisect_right(keys, probe):]
+            skip = 0
+        else:
+            candidates = reversed(ordered) if desc else ordered
+            skip = start
+
+        page = []
+        for row in candidates:
+            if not matches(row):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            page.append(row)
+            if len(page) > limit:
+                break
+
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            last = page[-1]
+            next_cursor = encode_cursor(sort_by, order, sort_value(last, key_name), last.id)
+
+        if count == "none":
+            total = None
+        elif term is None:
+            total = len(ordered)
+        else:
+            total = sum(1 for row in ordered if matches(row))
+        return {"data": page, "count": total, "next_cursor": next_cursor}
+
+    def put(self, obj):
+        with self.lock:
+            if self.tables is None:
+                return
+            tables = dict(self.tables)
+            if isinstance(obj, CountryModel):
+                country = CountryRow(obj.id, obj.name, obj.created_at, obj.updated_at, bool(obj.is_deleted))
+                tables["countries"] = tables["countries"].replace([country])
+                self._put_states(tables, [
+                    replace(state, country=country)
+                    for state in tables["states"].rows.values() if state.country_id == obj.id
+                ])
+            elif isinstance(obj, StateModel):
+                country = tables["countries"].rows.get(obj.country_id)
+                self._put_states(tables, [StateRow(
+                    obj.id, obj.name, obj.created_at, obj.updated_at, bool(obj.is_deleted), obj.country_id, country
+                )])
+            elif isinstance(obj, CityModel):
+                state = tables["states"].rows.get(obj.state_id)
+                tables["cities"] = tables["cities"].replace([CityRow(
+                    obj.id, obj.name, obj.created_at, obj.updated_at, bool(obj.is_deleted), obj.state_id, state
+                )])
+            self.tables = tables
+
+    @staticmethod
+    def _put_states(tables: dict, states: list):
+        # rows are shared by reference, so the cities of a changed state are re-pointed too
+        if not states:
+            return
+        tables["states"] = tables["states"].replace(states)
+        by_id = {state.id: state for state in states}
+        tables["cities"] = tables["cities"].replace([
+            replace(city, state=by_id[city.state_id])
+            for city in tables["cities"].rows.values() if city.state_id in by_id
+        ])
+
+
+geo_cache = GeoCache(GEO_CACHE_TTL)
@@ -0,0 +1,163 @@
+"""Bulk loader for country -> state -> city datasets.
+
+    python -m libs.geo_loader world.tsv --mode upsert
+    python -m libs.geo_loader world.json
+
+TSV input has a header row with ``country``, ``state`` and ``city``
+columns (GeoNames-style flat export, one row per city; extra columns are
+ignored). JSON input is a list of countries with nested ``states`` and
+``cities`` lists. In ``upsert`` mode rows that already exist under the
+same parent (matched by name) are reused instead of inserted again.
+"""
+import argparse
+import json
+import os
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from models import CountryModel, StateModel, CityModel
+from libs.counting import invalidate_counts
+from libs.geo_cache import geo_cache
+from libs.search import invalidate_index
+
+load_dotenv()
+
+
+GEO_LOAD_BATCH_SIZE = int(os.getenv("GEO_LOAD_BATCH_SIZE", "5000"))
+LOAD_MODES = ["insert", "upsert"]
+
+
+class GeoTree:
+    def __init__(self):
+        self.countries = {}
+        self.header = None
+
+    def add(self, country: str, state: str = None, city: str = None):
+        country, state, city = (value.strip() if value else None for value in (country, state, city))
+        if not country:
+            return
+        states = self.countries.setdefault(country, {})
+        if not state:
+            return
+        cities = states.setdefault(state, {})
+        if city:
+            cities[city] = None
+
+    def add_tsv_line(self, line: str):
+        values = line.rstrip("\r\n").split("\t")
+        if self.header is None:
+            self.header = [value.strip().lower() for value in values]
+            return
+        row = dict(zip(self.header, values))
+        self.add(row.get("country"), row.get("state"), row.get("city"))
+
+    def add_json(self, countries: list):
+        if not isinstance(countries, list):
+            raise ValueError("Expected a JSON list of countries")
+        for index, country in enumerate(countries):
+            where = f"[{index}]"
+            try:
+                self.add(country["name"])
+                for state_index, state in enumerate(country.get("states", [])):
+                    where = f"[{index}].states[{state_index}]"
+                    self.add(country["name"], state["name"])
+                    for city_index, city in enumerate(state.get("cities", [])):
+                        where = f"[{index}].states[{state_index}].cities[{city_index}]"
+                        self.add(country["name"], state["name"], city["name"] if isinstance(city, dict) else city)
+            except KeyError as e:
+                raise ValueError(f"{where}: missing {e}")
+            except (TypeError, AttributeError):
+                raise ValueError(f"{where}: expected {{name, states: [{{name, cities: [...]}}]}}")
+
+
+def _batches(rows: list):
+    for start in range(0, len(rows), GEO_LOAD_BATCH_SIZE):
+        yield rows[start:start + GEO_LOAD_BATCH_SIZE]
+
+
+def _existing(db: Session, model, parent_column, parent_ids):
+    # (parent_id, name) -> id of live rows; countries have no parent
+    if parent_column is None:
+        query = select(model.id, model.name).where(model.is_deleted == False)
+        return {(None, name): row_id for row_id, name in db.execute(query)}
+    existing = {}
+    for batch in _batches(list(parent_ids)):
+        query = select(model.id, model.name, parent_column).where(parent_column.in_(batch), model.is_deleted == False)
+        for row_id, name, parent_id in db.execute(query):
+            existing.setdefault((parent_id, name), row_id)
+    return existing
+
+
+def _load_level(db: Session, model, parent_column, wanted: list, mode: str):
+    """Insert ``wanted`` (parent_id, name) pairs and return their ids."""
+    parent_ids = {parent_id for parent_id, _ in wanted}
+    ids = _existing(db, model, parent_column, parent_ids) if mode == "upsert" else {}
+    missing = [key for key in dict.fromkeys(wanted) if key not in ids]
+
+    max_id = db.scalar(select(func.max(model.id))) or 0
+    for batch in _batches(missing):
+        rows = [{"name": name} if parent_column is None else {"name": name, parent_column.key: parent_id} for parent_id, name in batch]
+        db.execute(insert(model), rows)
+
+    # MySQL has no RETURNING, so read the new ids back by (parent, name)
+    query = select(model.id, model.name) if parent_column is None else select(model.id, model.name, parent_column)
+    for row in db.execute(query.where(model.id > max_id)):
+        ids.setdefault((None if parent_column is None else row[2], row[1]), row[0])
+    return ids, {"inserted": len(missing), "existing": len(set(wanted)) - len(missing)}
+
+
+def load_geography(db: Session, tree: GeoTree, mode: str = "insert"):
+    countries = [(None, name) for name in tree.countries]
+    country_ids, country_report = _load_level(db, CountryModel, None, countries, mode)
+
+    states = [
+        (country_ids[(None, country)], state)
+        for country, country_states in tree.countries.items()
+        for state in country_states
+    ]
+    state_ids, state_report = _load_level(db, StateModel, StateModel.country_id, states, mode)
+
+    cities = [
+        (state_ids[(country_ids[(None, country)], state)], city)
+        for country, country_states in tree.countries.items()
+        for state, state_cities in country_states.items()
+        for city in state_cities
+    ]
+    _, city_report = _load_level(db, CityModel, CityModel.state_id, cities, mode)
+    db.commit()
+
+    for model in (CountryModel, StateModel, CityModel):
+        invalidate_counts(model.__tablename__)
+        invalidate_index(model.__tablename__)
+    geo_cache.invalidate()
+    return {"countries": country_report, "states": state_report, "cities": city_report}
+
+
+def main():
+    from database import Sessionlocal
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--mode", choices=LOAD_MODES, default="insert")
+    args = parser.parse_args()
+
+    tree = GeoTree()
+    with open(args.path, encoding="utf-8-sig") as f:
+        if args.path.endswith(".json"):
+            try:
+                tree.add_json(json.load(f))
+            except ValueError as e:
+                raise SystemExit(f"{args.path}: {e}")
+        else:
+            for line in f:
+                if line.strip():
+                    tree.add_tsv_line(line)
+
+    with Sessionlocal() as db:
+        print(json.dumps(load_geography(db, tree, args.mode), indent=2))
+
+
+if __name__ == "__main__":
+    main()
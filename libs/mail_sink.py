@@ -0,0 +1,56 @@
+"""Local SMTP stand-in for development and tests.
+
+    python -m libs.mail_sink --port 8025
+
+then run the app with EMAIL_SERVER=localhost EMAIL_PORT=8025 EMAIL_STARTTLS=false.
+"""
+import argparse
+import threading
+
+from aiosmtpd.controller import Controller
+
+
+class MailSink:
+    def __init__(self, echo: bool = False):
+        self.echo = echo
+        self.messages = []
+        self.received = threading.Condition()
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.received:
+            self.messages.append(envelope)
+            self.received.notify_all()
+        if self.echo:
+            print(envelope.mail_from, "->", ", ".join(envelope.rcpt_tos))
+            print(envelope.content.decode("utf8", errors="replace"))
+        return "250 Message accepted for delivery"
+
+    def wait_for(self, count: int, timeout: float = 5):
+        with self.received:
+            return self.received.wait_for(lambda: len(self.messages) >= count, timeout)
+
+
+def start_sink(host: str = "localhost", port: int = 8025, echo: bool = False):
+    controller = Controller(MailSink(echo), hostname=host, port=port)
+    controller.start()
+    return controller
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accept and print outbound mail locally")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    controller = start_sink(args.host, args.port, echo=True)
+    print(f"Listening on {args.host}:{args.port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import EmailMessage
+
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", str(EMAIL_WORKERS)))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))
+EMAIL_QUEUE_MAX = int(os.getenv("EMAIL_QUEUE_MAX", "10000"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "5"))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", "1"))
+EMAIL_RETRY_MAX_DELAY = float(os.getenv("EMAIL_RETRY_MAX_DELAY", "60"))
+EMAIL_CONN_MAX_IDLE = float(os.getenv("EMAIL_CONN_MAX_IDLE", "60"))
+EMAIL_TIMEOUT = float(os.getenv("EMAIL_TIMEOUT", "10"))
+EMAIL_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() in ("1", "true", "yes")
+
+
+def build_message(recipient, subject, content):
+    msg = EmailMessage()
+    msg['Subject'] = subject
+    msg['From'] = os.getenv("EMAIL_FROM")
+    msg['To'] = recipient
+    msg.set_content(content)
+    return msg
+
+
+class SMTPPool:
+    """Logged-in SMTP connections kept open between batches.
+
+    Connections idle for longer than ``max_idle`` are closed instead of
+    reused, since most servers drop them after a minute or so.
+    """
+
+    def __init__(self, size: int, max_idle: float):
+        self.size = size
+        self.max_idle = max_idle
+        self.idle = []
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(os.getenv("EMAIL_SERVER"), int(os.getenv("EMAIL_PORT")), timeout=EMAIL_TIMEOUT)
+        try:
+            if EMAIL_STARTTLS:
+                server.starttls()
+            if os.getenv("EMAIL_PASSWORD"):
+                server.login(os.getenv("EMAIL_FROM"), os.getenv("EMAIL_PASSWORD"))
+        except Exception:
+            self.discard(server)
+            raise
+        with self.lock:
+            self.opened += 1
+        return server
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                server, last_used = self.idle.pop()
+            if time.monotonic() - last_used <= self.max_idle:
+                return server
+            self.discard(server)
+        return self._connect()
+
+    def release(self, server):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append((server, time.monotonic()))
+                return
+        self.discard(server)
+
+    def discard(self, server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for server, _ in idle:
+            self.discard(server)
+
+
+class MailQueue:
+    """Background delivery of outbound mail.
+
+    ``enqueue`` only puts the message on an in-process queue; worker threads
+    drain it in batches of up to ``batch_size`` over pooled connections.
+    Temporary failures (connection errors, 4xx replies) are retried with
+    exponential backoff, permanent 5xx rejections are dropped.
+    """
+
+    def __init__(self, pool: SMTPPool, workers: int, batch_size: int, max_queue: int, max_retries: int):
+        self.pool = pool
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.threads = []
+        self.lock = threading.Lock()
+        self.enqueued = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"mail-{i}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def enqueue(self, msg: EmailMessage):
+        self._start()
+        try:
+            self.queue.put_nowait((msg, 0))
+        except queue.Full:
+            with self.lock:
+                self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Mail queue is full")
+        with self.lock:
+            self.enqueued += 1
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            batch, stop = [item], False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._send(batch)
+            if stop:
+                return
+
+    def _send(self, batch):
+        try:
+            server = self.pool.acquire()
+        except (smtplib.SMTPException, OSError):
+            for item in batch:
+                self._retry(item)
+            return
+
+        for i, (msg, attempt) in enumerate(batch):
+            try:
+                server.send_message(msg)
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code >= 500:
+                    self._count("failed")
+                else:
+                    self._retry((msg, attempt))
+                continue
+            except smtplib.SMTPRecipientsRefused:
+                self._count("failed")
+                continue
+            except (smtplib.SMTPException, OSError):
+                # the connection is gone; the rest of the batch goes back on the queue
+                self.pool.discard(server)
+                self._retry((msg, attempt))
+                for item in batch[i + 1:]:
+                    self._requeue(item)
+                return
+            self._count("sent")
+        self.pool.release(server)
+
+    def _requeue(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self._count("failed")
+
+    def _retry(self, item):
+        msg, attempt = item
+        if attempt >= self.max_retries:
+            self._count("failed")
+            return
+        self._count("retried")
+        delay = min(EMAIL_RETRY_BACKOFF * 2 ** attempt, EMAIL_RETRY_MAX_DELAY)
+        timer = threading.Timer(delay, self._requeue, ((msg, attempt + 1),))
+        timer.daemon = True
+        timer.start()
+
+    def _count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "queued": self.queue.qsize(),
+                "enqueued": self.enqueued,
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "connections_opened": self.pool.opened,
+            }
+
+    def shutdown(self, timeout: float = 5):
+        # Whatever is already queued is sent first; pending retries are dropped
+        with self.lock:
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self.pool.close()
+
+
+mail_queue = MailQueue(
+    SMTPPool(EMAIL_POOL_SIZE, EMAIL_CONN_MAX_IDLE),
+    EMAIL_WORKERS,
+    EMAIL_BATCH_SIZE,
+    EMAIL_QUEUE_MAX,
+    EMAIL_MAX_RETRIES,
+)
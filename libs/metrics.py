@@ -0,0 +1,122 @@
+import os
+import time
+
+from dotenv import load_dotenv
+from fastapi import Response
+from sqlalchemy import event
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+from database import CheckoutTimer, engine
+from libs.password_pool import password_pool
+
+load_dotenv()
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# set by the process manager when several workers share one /metrics
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests_total", "Requests by route and status code", ["method", "route", "status"],
+)
+IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "Requests currently being handled", multiprocess_mode="livesum",
+)
+POOL_CHECKOUT = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled DB connection",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool", multiprocess_mode="livesum",
+)
+PASSWORD_POOL_IN_FLIGHT = Gauge(
+    "password_pool_in_flight", "bcrypt jobs running or queued", multiprocess_mode="livesum",
+)
+PASSWORD_POOL_QUEUED = Gauge(
+    "password_pool_queued", "bcrypt jobs waiting for a worker", multiprocess_mode="livesum",
+)
+PASSWORD_POOL_MAX_QUEUED = Gauge(
+    "password_pool_max_queued", "Most bcrypt jobs seen waiting at once", multiprocess_mode="max",
+)
+PASSWORD_POOL_REJECTED = Counter(
+    "password_pool_rejected_total", "bcrypt jobs turned away with a 503 by PASSWORD_POOL_MAX_QUEUE",
+)
+
+# Gauges are set as things change rather than through set_function, which the
+# multiprocess collector ignores: every worker writes its own value to
+# PROMETHEUS_MULTIPROC_DIR and /metrics combines them by multiprocess_mode.
+CheckoutTimer.observers.append(lambda pool, waited, timed_out: POOL_CHECKOUT.observe(waited))
+event.listen(engine, "checkout", lambda dbapi_connection, record, proxy: POOL_CHECKED_OUT.inc())
+event.listen(engine, "checkin", lambda dbapi_connection, record: POOL_CHECKED_OUT.dec())
+
+
+def _password_pool_changed(pool, change: str):
+    if change == "rejected":
+        PASSWORD_POOL_REJECTED.inc()
+        return
+    PASSWORD_POOL_IN_FLIGHT.set(pool.in_flight)
+    PASSWORD_POOL_QUEUED.set(max(pool.in_flight - pool.workers, 0))
+    PASSWORD_POOL_MAX_QUEUED.set(pool.max_queued)
+
+
+password_pool.observers.append(_password_pool_changed)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware so the hot path costs a couple of dict lookups.
+
+    Requests are labelled with the matched route template rather than the raw
+    path, so /users/1 and /users/2 share one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.children = {}
+
+    def _series(self, method: str, route: str, status: int):
+        key = (method, route, status)
+        series = self.children.get(key)
+        if series is None:
+            series = (REQUEST_LATENCY.labels(method, route), REQUESTS.labels(method, route, str(status)))
+            self.children[key] = series
+        return series
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_PROGRESS.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            latency, requests = self._series(scope["method"], path, status)
+            latency.observe(elapsed)
+            requests.inc()
+
+
+def metrics_response():
+    registry = REGISTRY
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,118 @@
+import hmac
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+OTP_TTL = int(os.getenv("OTP_TTL", "600"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+
+VALID = "valid"
+INVALID = "invalid"
+EXPIRED = "expired"
+LOCKED = "locked"
+
+# 1 valid (and consumed), 0 wrong code, -1 nothing issued or expired,
+# -2 wrong code and out of attempts (the OTP is dropped)
+CHECK_SCRIPT = """
+local stored = redis.call('HGET', KEYS[1], 'otp')
+if not stored then return -1 end
+if stored == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+local attempts = redis.call('HINCRBY', KEYS[1], 'attempts', 1)
+if attempts >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+return 0
+"""
+
+RESULTS = {1: VALID, 0: INVALID, -1: EXPIRED, -2: LOCKED}
+
+
+class MemoryOTPBackend:
+    """Per-process fallback used when no Redis client has been configured."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.next_sweep = 0
+
+    def _sweep(self, now: float):
+        if now < self.next_sweep:
+            return
+        self.entries = {key: entry for key, entry in self.entries.items() if entry[2] > now}
+        self.next_sweep = now + 60
+
+    async def issue(self, key: str, otp: str, ttl: int):
+        now = time.monotonic()
+        with self.lock:
+            self._sweep(now)
+            self.entries[key] = [otp, 0, now + ttl]
+
+    async def check(self, key: str, otp: str, max_attempts: int):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[2] <= time.monotonic():
+                self.entries.pop(key, None)
+                return -1
+            # bytes: compare_digest rejects str holding non-ASCII characters
+            if hmac.compare_digest(entry[0].encode(), otp.encode()):
+                del self.entries[key]
+                return 1
+            entry[1] += 1
+            if entry[1] >= max_attempts:
+                del self.entries[key]
+                return -2
+            return 0
+
+
+class RedisOTPBackend:
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(CHECK_SCRIPT)
+
+    async def issue(self, key: str, otp: str, ttl: int):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={"otp": otp, "attempts": 0})
+            pipe.expire(key, ttl)
+            await pipe.execute()
+
+    async def check(self, key: str, otp: str, max_attempts: int):
+        return int(await self.script(keys=[key], args=[otp, max_attempts]))
+
+
+class OTPStore:
+    """One-time codes keyed by email, expired by the backend's TTL.
+
+    Every wrong guess counts against ``max_attempts``; once they are used up
+    the code is dropped and a new one has to be requested.
+    """
+
+    def __init__(self, ttl: int, max_attempts: int):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.backend = MemoryOTPBackend()
+
+    def init(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def key(email: str):
+        return "otp:" + email.lower()
+
+    async def issue(self, email: str, otp: str):
+        await self.backend.issue(self.key(email), otp, self.ttl)
+
+    async def check(self, email: str, otp: str):
+        return RESULTS[await self.backend.check(self.key(email), otp, self.max_attempts)]
+
+
+otp_store = OTPStore(OTP_TTL, OTP_MAX_ATTEMPTS)
@@ -0,0 +1,112 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import QueryableAttribute
+
+from libs.counting import count_rows, exact_count
+
+
+def encode_cursor(sort_by: str, order: str, value, row_id: int):
+    payload = {"k": sort_by, "o": order, "id": row_id, "v": value, "t": None}
+    if isinstance(value, datetime):
+        payload["v"], payload["t"] = value.isoformat(), "dt"
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, order: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        value = payload["v"]
+        if payload["t"] == "dt":
+            value = datetime.fromisoformat(value)
+        row_id = int(payload["id"])
+        cursor_sort_by, cursor_order = payload["k"], payload["o"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort_by != sort_by or cursor_order != order:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort_by/order")
+    return value, row_id
+
+
+def _after(column, id_column, value, row_id, desc):
+    # NULLs sort first ascending and last descending (MySQL and SQLite)
+    if column is None:
+        return id_column < row_id if desc else id_column > row_id
+    if desc:
+        if value is None:
+            return and_(column.is_(None), id_column < row_id)
+        return or_(column < value, and_(column == value, id_column < row_id), column.is_(None))
+    if value is None:
+        return or_(column.isnot(None), and_(column.is_(None), id_column > row_id))
+    return or_(column > value, and_(column == value, id_column > row_id))
+
+
+def ordered(query, model, column, order: str):
+    keys = [model.id] if column is None else [column, model.id]
+    return query.order_by(*(key.desc() if order == "desc" else key.asc() for key in keys))
+
+
+def paginate(
+    query,
+    model,
+    sort_columns: dict,
+    sort_by: str,
+    order: str,
+    start: int,
+    limit: int,
+    cursor: str = None,
+    count: str = "exact",
+    filtered: bool = False,
+    rows=None,
+):
+    window = count == "window" and not cursor
+    total = None
+    if not window:
+        total = count_rows(query, model, "exact" if count == "window" else count, filtered)
+
+    column = sort_columns.get(sort_by)
+    desc = order == "desc"
+    page = ordered(query, model, column, order)
+
+    keyset = column is None or isinstance(column, QueryableAttribute)
+    if cursor and not keyset:
+        raise HTTPException(status_code=400, detail=f"Cursor pagination is not supported for sort_by={sort_by}")
+
+    if rows is not None:
+        extra = [model.id.label("cursor_id")]
+        if keyset and column is not None:
+            extra.append(column.label("cursor_value"))
+        page = rows.select(page, *extra)
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort_by, order)
+        page = page.filter(_after(column, model.id, value, row_id, desc))
+    else:
+        page = page.offset(start)
+
+    if window:
+        found = page.add_columns(func.count().over()).limit(limit + 1).all()
+        results = found if rows is not None else [row[0] for row in found]
+        total = found[0][-1] if found else (exact_count(query) if start else 0)
+    else:
+        results = page.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        if keyset:
+            last = results[-1]
+            if rows is not None:
+                value, row_id = None if column is None else last.cursor_value, last.cursor_id
+            else:
+                value, row_id = None if column is None else getattr(last, column.key), last.id
+            next_cursor = encode_cursor(sort_by, order, value, row_id)
+    if rows is not None:
+        results = [rows.build(row) for row in results]
+    return results, total, next_cursor
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+PASSWORD_POOL = os.getenv("PASSWORD_POOL", "thread")
+PASSWORD_POOL_WORKERS = int(os.getenv("PASSWORD_POOL_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_POOL_MAX_QUEUE = int(os.getenv("PASSWORD_POOL_MAX_QUEUE", "0"))
+
+
+class PasswordPool:
+    """Dedicated executor for bcrypt work, kept off the request threadpool.
+
+    ``workers`` bounds how many hashes run at once; with ``max_queue`` set,
+    submissions beyond that many waiting jobs are rejected with a 503.
+    ``observers`` are called with the pool and "submitted", "done" or
+    "rejected" after each change.
+    """
+
+    observers = []
+
+    def __init__(self, kind: str, workers: int, max_queue: int):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor = None
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+
+    def _executor(self):
+        if self.executor is None:
+            if self.kind == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self.executor
+
+    def submit(self, fn, *args):
+        with self.lock:
+            queued = max(self.in_flight - self.workers, 0)
+            rejected = bool(self.max_queue) and queued >= self.max_queue
+            if rejected:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+                self.submitted += 1
+                self.max_queued = max(self.max_queued, self.in_flight - self.workers)
+                executor = self._executor()
+        if rejected:
+            self._notify("rejected")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many password requests")
+        self._notify("submitted")
+        future = executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self.lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._notify("done")
+
+    def _notify(self, event: str):
+        for observe in self.observers:
+            observe(self, event)
+
+    def call(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self):
+        with self.lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "max_queued": self.max_queued,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+password_pool = PasswordPool(PASSWORD_POOL, PASSWORD_POOL_WORKERS, PASSWORD_POOL_MAX_QUEUE)
@@ -0,0 +1,150 @@
+import os
+import threading
+from collections import deque
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+import database
+
+load_dotenv()
+
+
+# checkout waits kept per pool for the percentiles
+POOL_STATS_SAMPLES = int(os.getenv("POOL_STATS_SAMPLES", "1000"))
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    return values[min(int(pct / 100 * len(values)), len(values) - 1)]
+
+
+def _round_ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class PoolStats:
+    """Counters for one engine's pool, fed by pool events and CheckoutTimer.
+
+    Peaks are the highest values seen at a checkout since start (or the
+    last reset), which is what matters when sizing pool_size/max_overflow.
+    """
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = getattr(engine, "sync_engine", engine)
+        self.lock = threading.Lock()
+        self.waits = deque(maxlen=POOL_STATS_SAMPLES)
+        self.reset()
+        event.listen(self.engine, "connect", self._on_connect)
+        event.listen(self.engine, "checkout", self._on_checkout)
+        event.listen(self.engine, "invalidate", self._on_invalidate)
+        event.listen(self.engine, "soft_invalidate", self._on_soft_invalidate)
+        event.listen(self.engine, "close", self._on_close)
+
+    def reset(self):
+        with self.lock:
+            self.counts = dict.fromkeys(
+                ("connects", "checkouts", "timeouts", "invalidations", "soft_invalidations", "closes"), 0
+            )
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+            self.observed = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.waits.clear()
+
+    def _count(self, key: str):
+        with self.lock:
+            self.counts[key] += 1
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self._count("connects")
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        pool = self.engine.pool
+        with self.lock:
+            self.counts["checkouts"] += 1
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self._count("invalidations")
+
+    def _on_soft_invalidate(self, dbapi_connection, connection_record, exception):
+        self._count("soft_invalidations")
+
+    def _on_close(self, dbapi_connection, connection_record):
+        self._count("closes")
+
+    def observe_wait(self, waited: float, timed_out: bool):
+        with self.lock:
+            self.waits.append(waited)
+            self.observed += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if timed_out:
+                self.counts["timeouts"] += 1
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self.lock:
+            waits = sorted(self.waits)
+            return {
+                "name": self.name,
+                "url": self.engine.url.render_as_string(hide_password=True),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": max(self.peak_overflow, 0),
+                **self.counts,
+                "checkout_wait_ms": {
+                    "mean": round(self.total_wait / self.observed * 1000, 3) if self.observed else None,
+                    "p50": _round_ms(_percentile(waits, 50)),
+                    "p95": _round_ms(_percentile(waits, 95)),
+                    "p99": _round_ms(_percentile(waits, 99)),
+                    "max": round(self.max_wait * 1000, 3),
+                },
+            }
+
+
+class PoolRegistry:
+    def __init__(self):
+        self.stats = []
+        database.CheckoutTimer.observers.append(self._observe)
+
+    def register(self, name: str, engine):
+        stats = PoolStats(name, engine)
+        self.stats.append(stats)
+        return stats
+
+    def _observe(self, pool, waited, timed_out):
+        # engine.pool is replaced by dispose(), so match on the engine's current pool
+        for stats in self.stats:
+            if stats.engine.pool is pool:
+                stats.observe_wait(waited, timed_out)
+                return
+
+    def snapshot(self):
+        return {
+            "options": database.POOL_OPTIONS,
+            "pools": [stats.snapshot() for stats in self.stats],
+            "replicas": database.replicas.status(),
+            "async_replicas": database.async_replicas.status(),
+        }
+
+    def reset(self):
+        for stats in self.stats:
+            stats.reset()
+
+
+pool_stats = PoolRegistry()
+pool_stats.register("primary", database.engine)
+for index, replica in enumerate(database.replicas.engines):
+    pool_stats.register(f"replica-{index}", replica)
+if database.async_engine is not None:
+    pool_stats.register("async-primary", database.async_engine)
+    for index, replica in enumerate(database.async_replicas.engines):
+        pool_stats.register(f"async-replica-{index}", replica)
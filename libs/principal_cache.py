@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+
+
+class PrincipalCache:
+    """LRU of verified tokens -> user column snapshot, bounded by size and TTL."""
+
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.tokens_by_user = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, user_id, data = entry
+            if expires_at <= time.time():
+                self._drop(key, user_id)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def set(self, token: str, user_id: int, data: dict, token_exp: int = None):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, token_exp)
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (expires_at, user_id, data)
+            self.entries.move_to_end(key)
+            self.tokens_by_user.setdefault(user_id, set()).add(key)
+            while len(self.entries) > self.maxsize:
+                old_key, (_, old_user_id, _) = self.entries.popitem(last=False)
+                self._forget(old_key, old_user_id)
+
+    def invalidate_user(self, user_id: int):
+        with self.lock:
+            for key in self.tokens_by_user.pop(user_id, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.tokens_by_user.clear()
+
+    def _drop(self, key, user_id):
+        self.entries.pop(key, None)
+        self._forget(key, user_id)
+
+    def _forget(self, key, user_id):
+        keys = self.tokens_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.tokens_by_user[user_id]
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_TTL, PRINCIPAL_CACHE_SIZE)
@@ -0,0 +1,214 @@
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from urllib.parse import parse_qsl
+
+from anyio import to_thread
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# users allowed to profile their own requests; empty turns profiling off.
+# Reading the stored profiles back is for ADMIN_USER_IDS.
+PROFILE_USER_IDS = {int(i) for i in os.getenv("PROFILE_USER_IDS", "").split(",") if i.strip()}
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MEMORY_TOP = int(os.getenv("PROFILE_MEMORY_TOP", "25"))
+PROFILE_MEMORY_FRAMES = int(os.getenv("PROFILE_MEMORY_FRAMES", "10"))
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKER_THREAD = "AnyIO worker thread"
+
+
+def _project_frame(filename: str):
+    return filename.startswith(PROJECT_ROOT) and "site-packages" not in filename
+
+
+def collapse(frame):
+    """Root-first ``module:function`` frames joined by ';' (flamegraph.pl / speedscope input)."""
+    names = []
+    ours = False
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}")
+        ours = ours or _project_frame(code.co_filename)
+        frame = frame.f_back
+    return ";".join(reversed(names)) if ours else None
+
+
+class Sampler:
+    """Samples the event loop thread and the threadpool workers.
+
+    Sync endpoints, dependencies and bcrypt run in AnyIO worker threads, which
+    a cProfile enabled in the loop thread would never see. Only stacks that go
+    through project code are kept, which drops idle workers and the idle loop;
+    requests served concurrently on the same threads do show up as well.
+    """
+
+    def __init__(self, loop_thread: int, interval: float):
+        self.loop_thread = loop_thread
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _threads(self):
+        idents = {self.loop_thread}
+        idents.update(t.ident for t in threading.enumerate() if t.name.startswith(WORKER_THREAD))
+        return idents
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            threads = self._threads()
+            for ident, frame in sys._current_frames().items():
+                if ident in threads:
+                    stack = collapse(frame)
+                    if stack:
+                        self.stacks[stack] += 1
+            self.samples += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+
+class ProfileStore:
+    def __init__(self, keep: int):
+        self.profiles = deque(maxlen=keep)
+        self.lock = threading.Lock()
+        # profiling samples every thread, so overlapping profiles would mix
+        self.busy = threading.Lock()
+
+    def add(self, profile: dict):
+        with self.lock:
+            self.profiles.append(profile)
+
+    def get(self, profile_id: str):
+        with self.lock:
+            for profile in self.profiles:
+                if profile["id"] == profile_id:
+                    return profile
+        return None
+
+    def summaries(self):
+        with self.lock:
+            return [
+                {key: value for key, value in profile.items() if key not in ("stacks", "memory")}
+                for profile in reversed(self.profiles)
+            ]
+
+
+profile_store = ProfileStore(PROFILE_KEEP)
+
+
+def collapsed_text(profile: dict):
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].most_common())
+
+
+def _snapshot():
+    # leave out the sampler's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, tracemalloc.__file__),
+    ])
+
+
+def _memory_top(before, after):
+    stats = after.compare_to(before, "traceback")[:PROFILE_MEMORY_TOP]
+    return [
+        {
+            "size_diff": stat.size_diff,
+            "count_diff": stat.count_diff,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+        }
+        for stat in stats
+    ]
+
+
+def _flag(value):
+    return value is not None and value.lower() not in ("", "0", "false", "no")
+
+
+class ProfilingMiddleware:
+    """Profiles a single request when it carries ``X-Profile: 1`` or ``?profile=1``.
+
+    ``X-Profile-Memory: 1`` / ``?profile_memory=1`` adds a tracemalloc diff.
+    The caller's token is checked with ``authorize`` first; the stored profile
+    id goes back in the ``X-Profile-Id`` header.
+    """
+
+    def __init__(self, app, authorize):
+        self.app = app
+        self.authorize = authorize
+
+    def _requested(self, scope):
+        headers = dict(scope["headers"])
+        params = dict(parse_qsl(scope.get("query_string", b"").decode()))
+        profile = headers.get(b"x-profile", b"").decode() or params.get("profile")
+        if not _flag(profile):
+            return None
+        memory = headers.get(b"x-profile-memory", b"").decode() or params.get("profile_memory")
+        return headers.get(b"token", b"").decode(), _flag(memory)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not PROFILE_USER_IDS:
+            await self.app(scope, receive, send)
+            return
+        requested = self._requested(scope)
+        if requested is None:
+            await self.app(scope, receive, send)
+            return
+        token, memory = requested
+        if not await to_thread.run_sync(self.authorize, token) or not profile_store.busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex[:12]
+        status = None
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        tracing = memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start(PROFILE_MEMORY_FRAMES)
+        before = _snapshot() if memory else None
+        sampler = Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            top = None
+            if memory:
+                top = _memory_top(before, _snapshot())
+                if tracing:
+                    tracemalloc.stop()
+            profile_store.busy.release()
+            profile_store.add({
+                "id": profile_id,
+                "at": datetime.now().isoformat(timespec="milliseconds"),
+                "route": f"{scope['method']} {getattr(scope.get('route'), 'path', scope['path'])}",
+                "status": status,
+                "duration_ms": round(elapsed * 1000, 2),
+                "samples": sampler.samples,
+                "interval_ms": PROFILE_INTERVAL_MS,
+                "stacks": sampler.stacks,
+                "memory": top,
+            })
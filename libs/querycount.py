@@ -0,0 +1,145 @@
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+import database
+
+load_dotenv()
+
+
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() == "true"
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("query_stats", default=())
+
+# "IN (?, ?, ?)" and "IN (%s, %s)" only differ by how many ids were loaded
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+)"
+_IN_LIST = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+
+
+def statement_shape(statement: str):
+    return _IN_LIST.sub("(...)", " ".join(statement.split()))
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def repeated(self, threshold: int):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get():
+        conn.info.setdefault("query_started", []).append((time.perf_counter(), context))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    active = _current.get()
+    if not active:
+        return
+    started = conn.info.get("query_started")
+    elapsed = time.perf_counter() - started.pop()[0] if started else 0.0
+    shape = statement_shape(statement)
+    for stats in active:
+        stats.seconds += elapsed
+        stats.count += 1
+        stats.shapes[shape] += 1
+
+
+def _handle_error(exception_context):
+    # a failed execute never reaches after_cursor_execute; errors raised later
+    # (while fetching) come after it already popped this statement's entry
+    conn = exception_context.connection
+    started = conn.info.get("query_started") if conn is not None else None
+    if started and started[-1][1] is exception_context.execution_context:
+        started.pop()
+
+
+def instrument(engine):
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def count_queries():
+    """Count the statements run inside the block, including in threadpool calls it awaits.
+
+    Blocks nest: an outer block also counts what inner ones (such as the
+    per-request one in QueryCountMiddleware) see.
+    """
+    stats = QueryStats()
+    token = _current.set(_current.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "block"):
+    """Fail with QueryBudgetExceeded when the block runs more than max_queries statements."""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        shapes = "\n".join(f"  {count}x {shape[:200]}" for shape, count in stats.shapes.most_common(5))
+        raise QueryBudgetExceeded(f"{label} ran {stats.count} queries, budget is {max_queries}\n{shapes}")
+
+
+class QueryCountMiddleware:
+    """Counts statements and DB time per request.
+
+    With QUERY_DEBUG the totals go out as X-DB-Query-Count / X-DB-Query-Time-Ms
+    headers. A statement shape repeating more than QUERY_REPEAT_THRESHOLD times
+    in one request (the usual N+1 signature) is logged as a warning.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if QUERY_DEBUG and message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"x-db-query-count", str(stats.count).encode()),
+                    (b"x-db-query-time-ms", f"{stats.seconds * 1000:.2f}".encode()),
+                ]
+            await send(message)
+
+        with count_queries() as stats:
+            await self.app(scope, receive, send_wrapper)
+
+        if QUERY_REPEAT_THRESHOLD:
+            for shape, count in stats.repeated(QUERY_REPEAT_THRESHOLD):
+                route = getattr(scope.get("route"), "path", scope["path"])
+                logger.warning("%s %s ran the same statement %d times: %s", scope["method"], route, count, shape[:300])
+
+
+instrument(database.engine)
+if database.async_engine is not None:
+    instrument(database.async_engine)
+for replica in (*database.replicas.engines, *database.async_replicas.engines):
+    instrument(replica)
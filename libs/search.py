@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+from database import pin_to_primary
+
+load_dotenv()
+
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+SEARCH_INDEX_TTL = int(os.getenv("SEARCH_INDEX_TTL", "300"))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+# the server's ngram_token_size; the FULLTEXT index holds no shorter tokens
+SEARCH_NGRAM_TOKEN_SIZE = int(os.getenv("SEARCH_NGRAM_TOKEN_SIZE", "2"))
+
+
+def trigrams(text: str):
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """In-process trigram index over the searchable columns of one table.
+
+    Used where the database has no native full-text index (SQLite, dev).
+    Rebuilt lazily after a write to the table or once SEARCH_INDEX_TTL
+    expires, so other workers' writes are picked up eventually.
+    """
+
+    def __init__(self, model, columns):
+        self.model = model
+        self.columns = columns
+        self.texts = {}
+        self.postings = {}
+        self.built_at = None
+        self.lock = threading.Lock()
+
+    def mark_stale(self):
+        self.built_at = None
+
+    def build(self, db: Session):
+        rows = db.execute(
+            select(self.model.id, *self.columns).where(self.model.is_deleted == False)
+        ).all()
+        texts, postings = {}, {}
+        for row_id, *values in rows:
+            text = " ".join(value for value in values if value).lower()
+            texts[row_id] = text
+            for gram in trigrams(text):
+                postings.setdefault(gram, set()).add(row_id)
+        self.texts, self.postings = texts, postings
+        self.built_at = time.monotonic()
+
+    def search(self, db: Session, term: str):
+        with self.lock:
+            if self.built_at is None or time.monotonic() - self.built_at > SEARCH_INDEX_TTL:
+                pin_to_primary(db)
+                self.build(db)
+            texts, postings = self.texts, self.postings
+
+        term = term.lower()
+        grams = {gram for gram in trigrams(term) if gram.strip() == gram} if len(term) >= 3 else set()
+        if grams:
+            candidates = set.intersection(*(postings.get(gram, set()) for gram in grams))
+        else:
+            candidates = texts.keys()
+
+        return [row_id for row_id in candidates if term in texts[row_id]]
+
+
+_indexes = {}
+
+
+def _trigram_index(model, columns):
+    index = _indexes.get(model.__tablename__)
+    if index is None:
+        index = _indexes.setdefault(model.__tablename__, TrigramIndex(model, columns))
+    return index
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_written_tables(session, flush_context):
+    tables = session.info.setdefault("search_written_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tables.add(getattr(obj, "__tablename__", None))
+
+
+def invalidate_index(table: str):
+    index = _indexes.get(table)
+    if index is not None:
+        index.mark_stale()
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_indexes_stale(session):
+    for table in session.info.pop("search_written_tables", ()):
+        invalidate_index(table)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    session.info.pop("search_written_tables", None)
+
+
+def _backend(db: Session):
+    if SEARCH_BACKEND != "auto":
+        return SEARCH_BACKEND
+    return "fulltext" if db.get_bind().dialect.name == "mysql" else "trigram"
+
+
+def _contains(columns, term: str):
+    condition = columns[0].ilike(f"%{term}%")
+    for column in columns[1:]:
+        condition = condition | column.ilike(f"%{term}%")
+    return condition
+
+
+def _position(columns, term: str):
+    text = func.coalesce(columns[0], "")
+    for column in columns[1:]:
+        text = text + " " + func.coalesce(column, "")
+    return func.instr(func.lower(text), term.lower())
+
+
+def apply_search(query, model, columns, term: str):
+    """Filter ``query`` to rows whose ``columns`` contain ``term``.
+
+    Returns the filtered query and a rank expression (best match sorts
+    first in ascending order) for ``sort_by=relevance``.
+    """
+    backend = _backend(query.session)
+
+    if backend == "fulltext":
+        if len(term) < SEARCH_NGRAM_TOKEN_SIZE:
+            return query.filter(_contains(columns, term)), _position(columns, term)
+        phrase = '"' + term.replace('"', " ") + '"'
+        score = match(*columns, against=phrase).in_boolean_mode()
+        return query.filter(score > 0), -score
+
+    if backend == "trigram":
+        ids = _trigram_index(model, columns).search(query.session, term)
+        # an unselective term gains nothing from a huge IN list
+        condition = model.id.in_(ids) if len(ids) <= SEARCH_MAX_CANDIDATES else _contains(columns, term)
+        return query.filter(condition), _position(columns, term)
+
+    return query.filter(_contains(columns, term)), None
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import database
+
+load_dotenv()
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+SLOW_QUERY_BUFFER = int(os.getenv("SLOW_QUERY_BUFFER", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "true").lower() == "true"
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG")
+SLOW_QUERY_LOG_MAX_BYTES = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5"))
+
+SENSITIVE = {"password", "otp", "old_password", "new_password", "access_token", "token"}
+REDACTED = "***"
+# bcrypt hashes in raw SQL that has no bind names to go by
+_BCRYPT = re.compile(r"^\$2[abxy]?\$\d\d\$")
+_BIND_SUFFIX = re.compile(r"_\d+$")
+MAX_ROWS = 5
+
+_scope = ContextVar("slow_query_scope", default=None)
+
+
+def current_route():
+    # routing has already filled scope["route"] by the time a handler queries
+    scope = _scope.get()
+    if scope is None:
+        return None
+    return f"{scope['method']} {getattr(scope.get('route'), 'path', scope['path'])}"
+
+
+def _sensitive(name):
+    return name is not None and _BIND_SUFFIX.sub("", name).lower() in SENSITIVE
+
+
+def _redact_value(name, value):
+    if _sensitive(name) or (isinstance(value, str) and _BCRYPT.match(value)):
+        return REDACTED
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value)} bytes>"
+    return value if isinstance(value, (int, float, bool, type(None))) else str(value)
+
+
+def redact(parameters, names=None):
+    if isinstance(parameters, dict):
+        return {key: _redact_value(key, value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        names = list(names or ())
+        return [_redact_value(names[i] if i < len(names) else None, value) for i, value in enumerate(parameters)]
+    return parameters
+
+
+class SlowQueryLog:
+    """Ring buffer of statements slower than ``threshold_ms``.
+
+    Recording happens on the request thread and only copies what it needs;
+    EXPLAIN runs afterwards on a single background thread with its own
+    connection, then the finished entry is written to the rotating file.
+    """
+
+    def __init__(self, threshold_ms: float, size: int, explain: bool, path: str = None):
+        self.threshold = threshold_ms / 1000
+        self.explain_enabled = explain
+        self.entries = deque(maxlen=size)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.logger = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=SLOW_QUERY_LOG_MAX_BYTES, backupCount=SLOW_QUERY_LOG_BACKUPS)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self.logger = logging.getLogger("slow_queries")
+            self.logger.propagate = False
+            self.logger.setLevel(logging.INFO)
+            self.logger.addHandler(handler)
+
+    def _executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query")
+            return self.executor
+
+    def record(self, engine, statement, parameters, context, executemany, elapsed):
+        compiled = getattr(context, "compiled", None)
+        names = getattr(compiled, "positiontup", None)
+        if executemany:
+            params = [redact(row, names) for row in list(parameters)[:MAX_ROWS]]
+        else:
+            params = redact(parameters, names)
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "duration_ms": round(elapsed * 1000, 2),
+            "route": current_route(),
+            "statement": statement,
+            "parameters": params,
+            "rows": len(parameters) if executemany else None,
+            "explain": None,
+        }
+        with self.lock:
+            self.entries.append(entry)
+
+        is_select = statement.lstrip()[:6].upper() == "SELECT"
+        if (self.explain_enabled and is_select and not executemany) or self.logger:
+            # the raw parameters are only kept long enough to run EXPLAIN
+            self._executor().submit(self._finish, entry, engine, statement, parameters if is_select else None)
+
+    def _finish(self, entry, engine, statement, parameters):
+        if self.explain_enabled and parameters is not None:
+            try:
+                entry["explain"] = explain(engine, statement, parameters)
+            except Exception as e:
+                entry["explain"] = f"EXPLAIN failed: {e}"
+        if self.logger:
+            self.logger.info(json.dumps(entry, default=str))
+
+    def recent(self, limit: int = 50):
+        with self.lock:
+            return list(reversed(self.entries))[:limit]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+
+def _explain(conn, statement, parameters):
+    conn.info["slow_query_skip"] = True
+    try:
+        if conn.dialect.name == "sqlite":
+            return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        return [dict(row) for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings()]
+    finally:
+        conn.info.pop("slow_query_skip", None)
+
+
+@lru_cache(maxsize=None)
+def _async_explain_engine(url):
+    # the async engine's pooled connections belong to the app's event loop
+    return create_async_engine(url, poolclass=NullPool)
+
+
+async def _explain_async(url, statement, parameters):
+    async with _async_explain_engine(url).connect() as conn:
+        return await conn.run_sync(_explain, statement, parameters)
+
+
+def explain(engine, statement, parameters):
+    """EXPLAIN on the engine that ran the statement, so replica reads get the replica's plan."""
+    if engine.dialect.is_async:
+        return asyncio.run(_explain_async(engine.url, statement, parameters))
+    with engine.connect() as conn:
+        return _explain(conn, statement, parameters)
+
+
+slow_query_log = SlowQueryLog(SLOW_QUERY_MS, SLOW_QUERY_BUFFER, SLOW_QUERY_EXPLAIN, SLOW_QUERY_LOG)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_started", []).append((time.perf_counter(), context))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("slow_query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()[0]
+    if elapsed >= slow_query_log.threshold and not conn.info.get("slow_query_skip"):
+        slow_query_log.record(conn.engine, statement, parameters, context, executemany, elapsed)
+
+
+def _handle_error(exception_context):
+    # only a statement that failed in execute still has its entry on top
+    conn = exception_context.connection
+    started = conn.info.get("slow_query_started") if conn is not None else None
+    if started and started[-1][1] is exception_context.execution_context:
+        started.pop()
+
+
+def instrument(engine):
+    engine = getattr(engine, "sync_engine", engine)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+
+class SlowQueryMiddleware:
+    """Remembers which route is running so slow statements can be attributed to it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _scope.reset(token)
+
+
+if SLOW_QUERY_MS > 0:
+    instrument(database.engine)
+    if database.async_engine is not None:
+        instrument(database.async_engine)
+    for replica in (*database.replicas.engines, *database.async_replicas.engines):
+        instrument(replica)
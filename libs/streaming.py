@@ -0,0 +1,62 @@
+import codecs
+import csv
+import json
+
+
+async def iter_lines(stream):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for data in stream:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv(stream):
+    header = None
+    record = ""
+    async for line in iter_lines(stream):
+        record = f"{record}\n{line}" if record else line
+        # a quoted field may span lines; wait until the quotes balance
+        if record.count('"') % 2:
+            continue
+        if record.strip():
+            values = next(csv.reader([record]))
+            if header is None:
+                header = [name.strip() for name in values]
+            else:
+                yield {name: (value if value != "" else None) for name, value in zip(header, values)}
+        record = ""
+    if record.strip():
+        yield dict(zip(header or [], next(csv.reader([record]))))
+
+
+async def iter_ndjson(stream):
+    async for line in iter_lines(stream):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield e
+
+
+def iter_records(stream, content_type: str):
+    if "csv" in content_type:
+        return iter_csv(stream)
+    return iter_ndjson(stream)
+
+
+async def chunked(records, size: int):
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
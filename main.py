@@ -5,7 +5,15 @@ import redis.asyncio as redis
 
 # from database import engine
 # import models
+from libs.password_pool import password_pool
+from libs.mailer import mail_queue
+from libs.otp_store import otp_store, RedisOTPBackend
+from libs.metrics import METRICS_ENABLED, MetricsMiddleware, metrics_response
+from libs.querycount import QueryCountMiddleware
+from libs.slowlog import SlowQueryMiddleware, slow_query_log
+from libs.profiling import ProfilingMiddleware
 from router.admin.v1.api import router as user_router
+from router.admin.v1.crud.user import can_profile
 
 
 app = FastAPI(
@@ -19,8 +27,27 @@ app = FastAPI(
 
 app.include_router(user_router)
 
+app.add_middleware(QueryCountMiddleware)
+app.add_middleware(SlowQueryMiddleware)
+app.add_middleware(ProfilingMiddleware, authorize=can_profile)
+
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
 
 @app.on_event("startup")
 async def startup():
     redis_instance = redis.Redis(host="localhost", port=6379, db=0)
     FastAPICache.init(RedisBackend(redis_instance), prefix="fastapi-cache")
+    otp_store.init(RedisOTPBackend(redis_instance))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    password_pool.shutdown()
+    mail_queue.shutdown()
+    slow_query_log.shutdown()
@@ -1,29 +1,40 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, Boolean, ForeignKey, Index, case
 from sqlalchemy.orm import relationship
+from sqlalchemy.sql.expression import Grouping
 
 from database import Base
 
 class UserModel(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        Index('ft_users_search', 'name', 'email', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        Index('ix_users_is_deleted_created_at', 'is_deleted', 'created_at'),
+        Index('ix_users_is_deleted_name', 'is_deleted', 'name'),
+        Index('ix_users_is_deleted_email', 'is_deleted', 'email'),
+        Index('ix_users_city_id_is_deleted', 'city_id', 'is_deleted'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(255))
-    email = Column(String(255),index=True)
+    email = Column(String(255))
     dob = Column(Date)
     password = Column(String(255))
     is_deleted = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now)
-    otp = Column(String(10))
-    opt_updated_at = Column(DateTime,default=datetime.now)
     city_id = Column(Integer, ForeignKey("cities.id"), nullable=True)
 
     cities = relationship("CityModel", back_populates="users")
 
 class CountryModel(Base):
     __tablename__ = 'countries'
+    __table_args__ = (
+        Index('ft_countries_search', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        Index('ix_countries_is_deleted_created_at', 'is_deleted', 'created_at'),
+        Index('ix_countries_is_deleted_name', 'is_deleted', 'name'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
@@ -36,6 +47,12 @@ class CountryModel(Base):
 
 class StateModel(Base):
     __tablename__ = 'states'
+    __table_args__ = (
+        Index('ft_states_search', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        Index('ix_states_is_deleted_created_at', 'is_deleted', 'created_at'),
+        Index('ix_states_is_deleted_name', 'is_deleted', 'name'),
+        Index('ix_states_country_id_is_deleted', 'country_id', 'is_deleted'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     country_id = Column(Integer, ForeignKey("countries.id"), nullable=True)
@@ -50,6 +67,12 @@ class StateModel(Base):
 
 class CityModel(Base):
     __tablename__ = 'cities'
+    __table_args__ = (
+        Index('ft_cities_search', 'name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        Index('ix_cities_is_deleted_created_at', 'is_deleted', 'created_at'),
+        Index('ix_cities_is_deleted_name', 'is_deleted', 'name'),
+        Index('ix_cities_state_id_is_deleted', 'state_id', 'is_deleted'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     state_id = Column(Integer, ForeignKey("states.id"), nullable=True)
@@ -59,4 +82,13 @@ class CityModel(Base):
     is_deleted = Column(Boolean, default=False)
 
     state = relationship("StateModel", back_populates="cities")
-    users = relationship("UserModel", back_populates="cities")
\ No newline at end of file
+    users = relationship("UserModel", back_populates="cities")
+
+
+# One live account per email; deleted rows map to NULL and never collide.
+# MySQL wants functional key parts wrapped in their own parentheses.
+Index(
+    'uq_users_active_email',
+    Grouping(case((UserModel.is_deleted == False, UserModel.email))),
+    unique=True,
+)
@@ -1,11 +1,23 @@
-from fastapi import APIRouter ,Depends, status, Response, Query, Header
+from fastapi import APIRouter ,Depends, status, Response, Query, Header, Request, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import Optional
-from fastapi_cache.decorator import cache
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from router.admin.v1 import schemas
-from dependencies import get_db
-from router.admin.v1.crud import cities, countries, states, user
+from libs.counting import COUNT_STRATEGIES
+from libs.export import EXPORT_FORMATS, MEDIA_TYPES
+from libs.conditional import conditional
+from libs.fastjson import fast_json
+from dependencies import get_db, get_read_session, get_session
+from router.admin.v1.crud import cities as city_crud, user as user_crud
+# awaitable on a Session or, under DB_ASYNC, an AsyncSession
+from router.admin.v1.async_crud import cities, countries, states, user
+from libs.geo_loader import GeoTree, LOAD_MODES, load_geography
+from libs.streaming import iter_lines
+from libs.poolstats import pool_stats
+from libs.profiling import collapsed_text, profile_store
+from libs.slowlog import SLOW_QUERY_BUFFER, SLOW_QUERY_MS, slow_query_log
 
 
 router = APIRouter()
@@ -16,29 +28,52 @@ router = APIRouter()
     response_model=schemas.UserList,
     tags=["User"]
 )
-def list_users(
+async def list_users(
     start: int = 0,
     limit: int = 10,
     city_id: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
-    sort_by: str = Query("created_at", enum=["created_at", "name", "email"]),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "email", "relevance"]),
     order: str = Query("asc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", enum=COUNT_STRATEGIES),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    data = user.get_all_users(
+    await user.verify_token(db, token)
+    data = await user.get_all_users(
         db=db,
         start=start,
         limit=limit,
         search=search,
         sort_by=sort_by,
         order=order,
-        city_id=city_id
+        city_id=city_id,
+        cursor=cursor,
+        count=count
     )
-    return data
+    return fast_json(schemas.UserList, data)
 
 
+@router.get(
+    "/users/export",
+    tags=["User"]
+)
+async def export_users(
+    format: str = Query("ndjson", enum=EXPORT_FORMATS),
+    city_id: Optional[int] = Query(None),
+    search: Optional[str] = Query(None),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "email", "relevance"]),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    db: Session = Depends(get_read_session),
+    token: str = Header(None),
+):
+    await user.verify_token(db, token)
+    return StreamingResponse(
+        user_crud.export_users(format, search=search, sort_by=sort_by, order=order, city_id=city_id),
+        media_type=MEDIA_TYPES[format]
+    )
+
 
 @router.get(
     "/users/{user_id}",
@@ -46,14 +81,19 @@ def list_users(
     status_code=status.HTTP_200_OK,
     tags=["User"]
 )
-def get_user(
+async def get_user(
     user_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    db_user = user.get_user(db, user_id)
-    return db_user
+    await user.verify_token(db, token)
+    not_modified = conditional(request, response, schemas.User, await user.user_version(db, user_id))
+    if not_modified is not None:
+        return not_modified
+    db_user = await user.get_user(db, user_id)
+    return fast_json(schemas.User, db_user, headers=response.headers)
 
 
 @router.post(
@@ -62,27 +102,40 @@ def get_user(
     response_model=schemas.User,
     tags=["User"]
 )
-def create_user(
+async def create_user(
     users: schemas.Useradd,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    db_user = user.create_user(db, users)
+    db_user = await user.create_user(db, users)
     return db_user
 
 
+@router.post(
+    "/users/import",
+    tags=["User"]
+)
+async def import_users(
+    request: Request,
+    db: Session = Depends(get_db),
+    token: str = Header(None),
+):
+    await user.verify_token(db, token)
+    return await user_crud.import_users(db, request.stream(), request.headers.get("content-type", ""))
+
+
 @router.put(
     "/users/{user_id}",
     response_model=schemas.User,
     tags=["User"]
 )
-def update_user(
+async def update_user(
     user_id: int, 
     users: schemas.UserUpdate, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    db_user = user.update_user(db, user_id, users)
+    await user.verify_token(db, token)
+    db_user = await user.update_user(db, user_id, users)
     return db_user
 
 
@@ -91,13 +144,13 @@ def update_user(
     status_code=status.HTTP_200_OK,
     tags=["User"]
 )
-def delete_user(
+async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    user.delete_user(db, user_id)
+    await user.verify_token(db, token)
+    await user.delete_user(db, user_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -106,11 +159,11 @@ def delete_user(
     response_model=schemas.LoginResponse,
     tags=["User - Auth"]
 )
-def login_user(
+async def login_user(
     data: schemas.Login, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    db_user = user.sign_in(db, data)
+    db_user = await user.sign_in(db, data)
     return db_user
 
 
@@ -119,11 +172,11 @@ def login_user(
     "/forget-password",
     tags=["User - Auth"]
 )
-def user_forget_password(
+async def user_forget_password(
     data: schemas.ForgetPassword, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    db_user = user.forget_password(db,data)
+    db_user = await user.forget_password(db, data)
     return db_user
 
 
@@ -131,11 +184,11 @@ def user_forget_password(
     "/confirm-forget-password",
     tags=["User - Auth"]
 )
-def confirm_forget_password(
+async def confirm_forget_password(
     data: schemas.ConfirmPassword,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    db_user = user.confirm_forget_password(db,data)
+    db_user = await user.confirm_forget_password(db, data)
     return db_user
 
 
@@ -143,13 +196,13 @@ def confirm_forget_password(
     "/change-password",
     tags=["User - Auth"]
 )
-def user_change_password(
+async def user_change_password(
     data: schemas.ChangePassword,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user_obj = user.verify_token(db, token)
-    db_user = user.change_password(db,data,user_obj)
+    user_obj = await user.verify_token(db, token)
+    db_user = await user.change_password(db, data, user_obj)
     return db_user
 
 
@@ -158,13 +211,17 @@ def user_change_password(
     response_model=list[schemas.Country],
     tags = ["Country"]
 )
-@cache(expire=60)
 async def get_all_countries(
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return await countries.get_all_countries_cached()
+    await user.verify_token(db, token)
+    not_modified = conditional(request, response, list[schemas.Country], await countries.all_countries_version(db))
+    if not_modified is not None:
+        return not_modified
+    return fast_json(list[schemas.Country], await countries.get_all_countries(db), headers=response.headers)
 
 
 @router.post(
@@ -172,13 +229,13 @@ async def get_all_countries(
     response_model=schemas.Country,
     tags = ["Country"]
 )
-def create_country(
+async def create_country(
     country: schemas.CountryAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    country_obj = countries.create_country(db, country)
+    await user.verify_token(db, token)
+    country_obj = await countries.create_country(db, country)
     return country_obj
 
 
@@ -189,12 +246,12 @@ def create_country(
 )
 async def get_country(
     country_id: int, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):  
-    user.verify_token(db, token)
-    db_country = countries.get_country(db, country_id)
-    return await db_country
+    await user.verify_token(db, token)
+    db_country = await countries.get_country(db, country_id)
+    return fast_json(schemas.Country, db_country)
 
 
 @router.get(
@@ -202,24 +259,29 @@ async def get_country(
     response_model=schemas.CountryList,
     tags = ["Country"]
 )
-def get_countries(
+async def get_countries(
     start: int = 0,
     limit: int = 10,
     search: Optional[str] = Query(None),
-    sort_by: str = Query("created_at", enum=["created_at", "name"]),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "relevance"]),
     order: str = Query("asc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", enum=COUNT_STRATEGIES),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return countries.get_countries(
+    await user.verify_token(db, token)
+    data = await countries.get_countries(
         db=db,
         start=start,
         limit=limit,
         search=search,
         sort_by=sort_by,
-        order=order
+        order=order,
+        cursor=cursor,
+        count=count
     )
+    return fast_json(schemas.CountryList, data)
 
 
 @router.put(
@@ -227,14 +289,14 @@ def get_countries(
     response_model=schemas.Country,
     tags = ["Country"]
 )
-def update_country(
+async def update_country(
     country_id: int, 
     country: schemas.CountryAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    data = countries.update_country(db, country_id, name=country.name)
+    await user.verify_token(db, token)
+    data = await countries.update_country(db, country_id, name=country.name)
     return data
 
 
@@ -242,12 +304,12 @@ def update_country(
     "/countries/{country_id}",
     tags = ["Country"]
 )
-def delete_country(
-    country_id: int, db: Session = Depends(get_db),
+async def delete_country(
+    country_id: int, db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    countries.delete_country(db, country_id)
+    await user.verify_token(db, token)
+    await countries.delete_country(db, country_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -256,13 +318,13 @@ def delete_country(
     response_model=schemas.State,
     tags = ["State"]
 )
-def create_state(
+async def create_state(
     state: schemas.StateAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return states.create_state(db, state)
+    await user.verify_token(db, token)
+    return await states.create_state(db, state)
 
 
 @router.get(
@@ -270,12 +332,17 @@ def create_state(
     response_model=list[schemas.State],
     tags = ["State"]
 )
-def get_all_states(
-    db: Session = Depends(get_db),
+async def get_all_states(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return states.get_all_states(db)
+    await user.verify_token(db, token)
+    not_modified = conditional(request, response, list[schemas.State], await states.all_states_version(db))
+    if not_modified is not None:
+        return not_modified
+    return fast_json(list[schemas.State], await states.get_all_states(db), headers=response.headers)
 
 
 @router.get(
@@ -283,14 +350,14 @@ def get_all_states(
     response_model=schemas.State,
     tags = ["State"]
 )
-def get_state(
+async def get_state(
     state_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    db_state = states.get_state(db, state_id)
-    return db_state
+    await user.verify_token(db, token)
+    db_state = await states.get_state(db, state_id)
+    return fast_json(schemas.State, db_state)
 
 
 @router.get(
@@ -298,24 +365,29 @@ def get_state(
     response_model=schemas.StateList,
     tags = ["State"]
 )
-def get_states(
+async def get_states(
     start: int = 0,
     limit: int = 10,
     search: str = Query(None),
-    sort_by: str = Query("created_at", enum=["created_at", "name"]),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "relevance"]),
     order: str = Query("asc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", enum=COUNT_STRATEGIES),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return states.get_states(
+    await user.verify_token(db, token)
+    data = await states.get_states(
         db=db,
         start=start,
         limit=limit,
         search=search,
         sort_by=sort_by,
-        order=order
+        order=order,
+        cursor=cursor,
+        count=count
     )
+    return fast_json(schemas.StateList, data)
 
 
 @router.put(
@@ -323,14 +395,14 @@ def get_states(
     response_model=schemas.State,
     tags = ["State"]
 )
-def update_state(
+async def update_state(
     state_id: int,
     state: schemas.StateAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    db_state = states.update_state(db, state_id, state)
+    await user.verify_token(db, token)
+    db_state = await states.update_state(db, state_id, state)
     return db_state
 
 
@@ -338,13 +410,13 @@ def update_state(
     "/states/{state_id}",
     tags = ["State"]
 )
-def delete_state(
+async def delete_state(
     state_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    states.delete_state(db, state_id)
+    await user.verify_token(db, token)
+    await states.delete_state(db, state_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
@@ -353,24 +425,29 @@ def delete_state(
     response_model=schemas.CityList,
     tags=["City"]
 )
-def get_cities(
+async def get_cities(
     start: int = 0,
     limit: int = 10,
     search: Optional[str] = Query(None),
-    sort_by: str = Query("created_at", enun=["created_at", "name"]),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "relevance"]),
     order: str = Query("asc", enum=["asc", "desc"]),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None),
+    count: str = Query("exact", enum=COUNT_STRATEGIES),
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return cities.get_cities(
+    await user.verify_token(db, token)
+    data = await cities.get_cities(
         db=db,
         start=start,
         limit=limit,
         search=search,
         sort_by=sort_by,
-        order=order
+        order=order,
+        cursor=cursor,
+        count=count
     )
+    return fast_json(schemas.CityList, data)
 
 
 @router.post(
@@ -378,13 +455,13 @@ def get_cities(
     response_model=schemas.City,
     tags = ["City"]
 )
-def create_city(
+async def create_city(
     city: schemas.CityAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return cities.create_city(db, city)
+    await user.verify_token(db, token)
+    return await cities.create_city(db, city)
 
 
 @router.get(
@@ -392,27 +469,56 @@ def create_city(
     response_model=list[schemas.City],
     tags = ["City"]
 )
-def get_all_cities(
-    db: Session = Depends(get_db),
+async def get_all_cities(
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    return cities.get_all_cities(db)
+    await user.verify_token(db, token)
+    not_modified = conditional(request, response, list[schemas.City], await cities.all_cities_version(db))
+    if not_modified is not None:
+        return not_modified
+    return fast_json(list[schemas.City], await cities.get_all_cities(db), headers=response.headers)
 
 
 @router.get(
-    "/cities/{city_id}", 
+    "/cities/export",
+    tags=["City"]
+)
+async def export_cities(
+    format: str = Query("ndjson", enum=EXPORT_FORMATS),
+    search: Optional[str] = Query(None),
+    sort_by: str = Query("created_at", enum=["created_at", "name", "relevance"]),
+    order: str = Query("asc", enum=["asc", "desc"]),
+    db: Session = Depends(get_read_session),
+    token: str = Header(None),
+):
+    await user.verify_token(db, token)
+    return StreamingResponse(
+        city_crud.export_cities(format, search=search, sort_by=sort_by, order=order),
+        media_type=MEDIA_TYPES[format]
+    )
+
+
+@router.get(
+    "/cities/{city_id}",
     response_model=schemas.City,
     tags = ["City"]
 )
-def get_city(
+async def get_city(
     city_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    city = cities.get_city(db, city_id)
-    return city
+    await user.verify_token(db, token)
+    not_modified = conditional(request, response, schemas.City, await cities.city_version(db, city_id))
+    if not_modified is not None:
+        return not_modified
+    city = await cities.get_city(db, city_id)
+    return fast_json(schemas.City, city, headers=response.headers)
 
 
 @router.put(
@@ -420,13 +526,13 @@ def get_city(
     response_model=schemas.City,
     tags = ["City"]
 )
-def update_city(
+async def update_city(
     city_id: int, city: schemas.CityAdd, 
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_session),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    updated_city = cities.update_city(db, city_id, city)
+    await user.verify_token(db, token)
+    updated_city = await cities.update_city(db, city_id, city)
     return updated_city
 
 
@@ -435,11 +541,131 @@ def update_city(
     response_model=schemas.City,
     tags = ["City"]
 )
-def delete_city(
+async def delete_city(
     city_id: int, 
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_token(db, token)
+    await cities.delete_city(db, city_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.post(
+    "/geography/import",
+    tags=["Geography"]
+)
+async def import_geography(
+    request: Request,
+    mode: str = Query("insert", enum=LOAD_MODES),
     db: Session = Depends(get_db),
     token: str = Header(None),
 ):
-    user.verify_token(db, token)
-    cities.delete_city(db, city_id)
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    await user.verify_token(db, token)
+    tree = GeoTree()
+    if "json" in request.headers.get("content-type", ""):
+        try:
+            tree.add_json(await request.json())
+        except ValueError as e:
+            # also covers a body that is not JSON at all
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    else:
+        async for line in iter_lines(request.stream()):
+            if line.strip():
+                tree.add_tsv_line(line)
+    return await run_in_threadpool(load_geography, db, tree, mode)
+
+
+@router.get(
+    "/slow-queries",
+    tags=["Diagnostics"]
+)
+async def list_slow_queries(
+    limit: int = Query(50, ge=1, le=SLOW_QUERY_BUFFER),
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    return {"threshold_ms": SLOW_QUERY_MS, "data": slow_query_log.recent(limit)}
+
+
+@router.delete(
+    "/slow-queries",
+    tags=["Diagnostics"]
+)
+async def clear_slow_queries(
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    slow_query_log.clear()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get(
+    "/profiles",
+    tags=["Diagnostics"]
+)
+async def list_profiles(
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    return {"data": profile_store.summaries()}
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    tags=["Diagnostics"]
+)
+async def get_profile(
+    profile_id: str,
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed_text(profile))
+
+
+@router.get(
+    "/profiles/{profile_id}/memory",
+    tags=["Diagnostics"]
+)
+async def get_profile_memory(
+    profile_id: str,
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    profile = profile_store.get(profile_id)
+    if profile is None or profile["memory"] is None:
+        raise HTTPException(status_code=404, detail="Memory snapshot not found")
+    return {"data": profile["memory"]}
+
+
+@router.get(
+    "/pool-stats",
+    tags=["Diagnostics"]
+)
+async def get_pool_stats(
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    return pool_stats.snapshot()
+
+
+@router.delete(
+    "/pool-stats",
+    tags=["Diagnostics"]
+)
+async def reset_pool_stats(
+    db: Session = Depends(get_session),
+    token: str = Header(None),
+):
+    await user.verify_admin(db, token)
+    pool_stats.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
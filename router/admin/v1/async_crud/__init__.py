@@ -0,0 +1,28 @@
+from functools import lru_cache
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+@lru_cache(maxsize=None)
+def adapter(schema):
+    return TypeAdapter(schema)
+
+
+async def run(db, fn, schema, *args, **kwargs):
+    """Await the sync crud function ``fn`` on either kind of session.
+
+    An AsyncSession runs it through run_sync, a Session (DB_ASYNC off) on a
+    threadpool worker. The result is validated into ``schema`` on that side,
+    so nothing lazy-loads on the event loop once it is handed back.
+    """
+    def call(session):
+        result = fn(session, *args, **kwargs)
+        if schema is None:
+            return result
+        return adapter(schema).validate_python(result, from_attributes=True)
+
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(call)
+    return await run_in_threadpool(call, db)
@@ -0,0 +1,37 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from router.admin.v1.async_crud import run
+from router.admin.v1.crud import cities
+from router.admin.v1.schemas import CityAdd, City, CityList
+
+
+async def get_cities(db: AsyncSession, **kwargs):
+    return await run(db, cities.get_cities, CityList, **kwargs)
+
+
+async def create_city(db: AsyncSession, city: CityAdd):
+    return await run(db, cities.create_city, City, city)
+
+
+async def get_all_cities(db: AsyncSession):
+    return await run(db, cities.get_all_cities, list[City])
+
+
+async def get_city(db: AsyncSession, city_id: int):
+    return await run(db, cities.get_city, City, city_id)
+
+
+async def update_city(db: AsyncSession, city_id: int, city_data: CityAdd):
+    return await run(db, cities.update_city, City, city_id, city_data)
+
+
+async def delete_city(db: AsyncSession, city_id: int):
+    await run(db, cities.delete_city, None, city_id)
+
+
+async def all_cities_version(db: AsyncSession):
+    return await run(db, cities.all_cities_version, None)
+
+
+async def city_version(db: AsyncSession, city_id: int):
+    return await run(db, cities.city_version, None, city_id)
@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from router.admin.v1.async_crud import run
+from router.admin.v1.crud import countries
+from router.admin.v1.schemas import CountryAdd, Country, CountryList
+
+
+async def get_countries(db: AsyncSession, **kwargs):
+    return await run(db, countries.get_countries, CountryList, **kwargs)
+
+
+async def create_country(db: AsyncSession, country: CountryAdd):
+    return await run(db, countries.create_country, Country, country)
+
+
+async def get_country(db: AsyncSession, country_id: int):
+    return await run(db, countries.get_country, Country, country_id)
+
+
+async def get_all_countries(db: AsyncSession):
+    return await run(db, countries.get_all_countries, list[Country])
+
+
+async def update_country(db: AsyncSession, country_id: int, name: str):
+    return await run(db, countries.update_country, Country, country_id, name=name)
+
+
+async def delete_country(db: AsyncSession, country_id: int):
+    await run(db, countries.delete_country, None, country_id)
+
+
+async def all_countries_version(db: AsyncSession):
+    return await run(db, countries.all_countries_version, None)
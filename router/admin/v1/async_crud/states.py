@@ -0,0 +1,33 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from router.admin.v1.async_crud import run
+from router.admin.v1.crud import states
+from router.admin.v1.schemas import StateAdd, State, StateList
+
+
+async def get_states(db: AsyncSession, **kwargs):
+    return await run(db, states.get_states, StateList, **kwargs)
+
+
+async def create_state(db: AsyncSession, state: StateAdd):
+    return await run(db, states.create_state, State, state)
+
+
+async def get_state(db: AsyncSession, state_id: int):
+    return await run(db, states.get_state, State, state_id)
+
+
+async def get_all_states(db: AsyncSession):
+    return await run(db, states.get_all_states, list[State])
+
+
+async def update_state(db: AsyncSession, state_id: int, state: StateAdd):
+    return await run(db, states.update_state, State, state_id, state)
+
+
+async def delete_state(db: AsyncSession, state_id: int):
+    await run(db, states.delete_state, None, state_id)
+
+
+async def all_states_version(db: AsyncSession):
+    return await run(db, states.all_states_version, None)
@@ -0,0 +1,69 @@
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import UserModel
+from libs.utils import get_user_by_email, hash_password_async, verify_password_async
+from router.admin.v1.async_crud import run
+from router.admin.v1.crud import user
+from router.admin.v1.crud.loading import load_options
+from router.admin.v1.schemas import Useradd, UserUpdate, Login, ForgetPassword, ConfirmPassword, ChangePassword, User, UserList, LoginResponse
+
+
+async def get_all_users(db: AsyncSession, **kwargs):
+    return await run(db, user.get_all_users, UserList, **kwargs)
+
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await run(db, user.get_user, User, user_id)
+
+
+async def create_user(db: AsyncSession, data: Useradd):
+    hashed_password = await hash_password_async(data.password)
+    return await run(db, user.create_user, User, data, hashed_password)
+
+
+async def update_user(db: AsyncSession, user_id: int, data: UserUpdate):
+    return await run(db, user.update_user, User, user_id, data)
+
+
+async def delete_user(db: AsyncSession, user_id: int):
+    await run(db, user.delete_user, None, user_id)
+
+
+async def verify_token(db: AsyncSession, token: str):
+    return await run(db, user.verify_token, None, token)
+
+
+async def sign_in(db: AsyncSession, data: Login):
+    db_user = await run(db, get_user_by_email, None, data.email, load_options(UserModel, User))
+    if db_user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    if not await verify_password_async(data.password, db_user.password):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return await run(db, lambda session: user.login_response(db_user), LoginResponse)
+
+
+async def forget_password(db: AsyncSession, data: ForgetPassword):
+    db_user = await run(db, get_user_by_email, None, data.email)
+    return await user.send_reset_otp(db_user)
+
+
+async def confirm_forget_password(db: AsyncSession, data: ConfirmPassword):
+    await user.check_reset_otp(data)
+    hashed_password = await hash_password_async(data.password)
+    return await run(db, user.reset_password, None, data.email, hashed_password)
+
+
+async def change_password(db: AsyncSession, data: ChangePassword, user_obj):
+    if not await verify_password_async(data.old_password, user_obj.password):
+        raise HTTPException(status_code=400, detail="Incorrect old password")
+    hashed_password = await hash_password_async(data.new_password)
+    return await run(db, user.save_password, None, user_obj, hashed_password)
+
+
+async def user_version(db: AsyncSession, user_id: int):
+    return await run(db, user.user_version, None, user_id)
+
+
+async def verify_admin(db: AsyncSession, token: str):
+    return await run(db, user.verify_admin, None, token)
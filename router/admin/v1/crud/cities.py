@@ -1,41 +1,75 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from models import CityModel
+from database import ReadSessionlocal
+from models import CityModel, StateModel, CountryModel
 from libs.utils import now
-from router.admin.v1.schemas import CityAdd
+from libs.pagination import paginate, ordered
+from libs.export import export_query, stream_rows
+from libs.counting import invalidate_counts
+from libs.search import apply_search
+from libs.geo_cache import geo_cache, GEO_CACHE
+from libs.conditional import table_versions
+from router.admin.v1.schemas import CityAdd, City
 from router.admin.v1.crud.states import get_state_by_id
+from router.admin.v1.crud.loading import shape, load_options, readonly_rows, fetch_all
 
 
 
-def get_city_by_id(db: Session, city_id):
-    city = db.query(CityModel).filter(CityModel.id == city_id, CityModel.is_deleted == False).first()
+def get_city_by_id(db: Session, city_id, options=()):
+    city = db.query(CityModel).options(*options).filter(CityModel.id == city_id, CityModel.is_deleted == False).first()
     return city
 
 
+EXPORT_COLUMNS = {
+    "id": lambda city: city.id,
+    "name": lambda city: city.name,
+    "state_id": lambda city: city.state.id,
+    "state": lambda city: city.state.name,
+    "country_id": lambda city: city.state.country.id,
+    "country": lambda city: city.state.country.name,
+}
+
+
+def filter_cities(db: Session, search: str):
+    query = shape(db.query(CityModel), CityModel, City).filter(CityModel.is_deleted == False)
+    rank = None
+    if search:
+        query, rank = apply_search(query, CityModel, (CityModel.name,), search)
+
+    sort_columns = {"created_at": CityModel.created_at, "name": CityModel.name, "relevance": rank}
+    return query, sort_columns
+
+
 def get_cities(
     db: Session,
     start: int,
     limit: int,
     search: str,
     sort_by: str,
-    order: str
+    order: str,
+    cursor: str = None,
+    count: str = "exact"
 ):
-    query = db.query(CityModel).filter(CityModel.is_deleted == False)
-    if search:
-        query = query.filter(
-            CityModel.name.ilike(f"%{search}%")
-        )
+    if GEO_CACHE:
+        return geo_cache.list(db, "cities", start, limit, search, sort_by, order, cursor, count)
 
-    if sort_by == "created_at":
-        query = query.order_by(CityModel.created_at.desc() if order == "desc" else CityModel.created_at.asc())
-    elif sort_by == "name":
-        query = query.order_by(CityModel.name.desc() if order == "desc" else CityModel.name.asc())
+    query, sort_columns = filter_cities(db, search)
+    results, total, next_cursor = paginate(
+        query, CityModel, sort_columns, sort_by, order, start, limit,
+        cursor=cursor, count=count, filtered=bool(search),
+        rows=readonly_rows(CityModel, City)
+    )
 
-    total = query.count()
-    results = query.offset(start).limit(limit).all()
+    return {"data": results, "count": total, "next_cursor": next_cursor}
 
-    return {"data": results, "count": total}
+
+def export_cities(fmt: str, search: str, sort_by: str, order: str):
+    with ReadSessionlocal() as db:
+        query, sort_columns = filter_cities(db, search)
+        query = ordered(query, CityModel, sort_columns.get(sort_by), order)
+        yield from stream_rows(export_query(query), fmt, City, EXPORT_COLUMNS)
 
 
 def create_city(db: Session, city: CityAdd):
@@ -46,16 +80,48 @@ def create_city(db: Session, city: CityAdd):
     db_city = CityModel(**city.dict())
     db.add(db_city)
     db.commit()
+    invalidate_counts(CityModel.__tablename__)
     db.refresh(db_city)
+    geo_cache.put(db_city)
     return db_city
 
 
 def get_all_cities(db: Session):
-    return db.query(CityModel).filter(CityModel.is_deleted == False).all()
+    if GEO_CACHE:
+        return geo_cache.all(db, "cities")
+    return fetch_all(db.query(CityModel).filter(CityModel.is_deleted == False), CityModel, City)
+
+
+def all_cities_version(db: Session):
+    # each city carries its state and country names
+    if GEO_CACHE:
+        return geo_cache.version(db, "cities", "states", "countries")
+    return table_versions(db, CityModel, StateModel, CountryModel)
+
+
+def city_version(db: Session, city_id: int):
+    if GEO_CACHE:
+        city = geo_cache.get(db, "cities", city_id)
+        if city is None:
+            return None
+        state = city.state
+        country = state.country if state else None
+        return (city.updated_at, state.updated_at if state else None, country.updated_at if country else None)
+    row = db.execute(
+        select(CityModel.updated_at, StateModel.updated_at, CountryModel.updated_at)
+        .select_from(CityModel)
+        .outerjoin(CityModel.state)
+        .outerjoin(StateModel.country)
+        .where(CityModel.id == city_id, CityModel.is_deleted == False)
+    ).first()
+    return None if row is None else tuple(row)
 
 
 def get_city(db: Session, city_id: int):
-    db_city = get_city_by_id(db, city_id)
+    if GEO_CACHE:
+        db_city = geo_cache.get(db, "cities", city_id)
+    else:
+        db_city = get_city_by_id(db, city_id, options=load_options(CityModel, City))
     if not db_city:
         raise HTTPException(status_code=404, detail="City Not Found")
     return db_city
@@ -74,7 +140,9 @@ def update_city(db: Session, city_id: int, city_data: CityAdd):
     db_city.state_id = city_data.state_id
     db_city.updated_at = now()
     db.commit()
+    invalidate_counts(CityModel.__tablename__)
     db.refresh(db_city)
+    geo_cache.put(db_city)
     return db_city
 
 
@@ -84,5 +152,8 @@ def delete_city(db: Session, city_id: int):
         raise HTTPException(status_code=404, detail="City Not Found")
     
     db_city.is_deleted = True
+    db_city.updated_at = now()
     db.commit()
+    invalidate_counts(CityModel.__tablename__)
+    geo_cache.put(db_city)
     return db_city
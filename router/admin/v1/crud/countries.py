@@ -1,11 +1,15 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from fastapi_cache.decorator import cache
 
-from dependencies import get_db
 from models import CountryModel
 from libs.utils import now
-from router.admin.v1.schemas import CountryAdd
+from libs.pagination import paginate
+from libs.counting import invalidate_counts
+from libs.search import apply_search
+from libs.geo_cache import geo_cache, GEO_CACHE
+from libs.conditional import table_versions
+from router.admin.v1.schemas import CountryAdd, Country
+from router.admin.v1.crud.loading import readonly_rows, fetch_all
 
 
 def get_country_by_id(db: Session, country_id: int):
@@ -19,52 +23,56 @@ def get_countries(
     limit: int,
     search: str,
     sort_by: str,
-    order: str
+    order: str,
+    cursor: str = None,
+    count: str = "exact"
 ):
+    if GEO_CACHE:
+        return geo_cache.list(db, "countries", start, limit, search, sort_by, order, cursor, count)
+
     query = db.query(CountryModel).filter(CountryModel.is_deleted == False)
+    rank = None
     if search:
-        query = query.filter(
-            CountryModel.name.ilike(f"%{search}%")
-        )
-
-    if sort_by == "created_at":
-        query = query.order_by(CountryModel.created_at.desc() if order == "desc" else CountryModel.created_at.asc())
-    elif sort_by == "name":
-        query = query.order_by(CountryModel.name.desc() if order == "desc" else CountryModel.name.asc())
+        query, rank = apply_search(query, CountryModel, (CountryModel.name,), search)
 
-    total = query.count()
-    results = query.offset(start).limit(limit).all()
+    sort_columns = {"created_at": CountryModel.created_at, "name": CountryModel.name, "relevance": rank}
+    results, total, next_cursor = paginate(
+        query, CountryModel, sort_columns, sort_by, order, start, limit,
+        cursor=cursor, count=count, filtered=bool(search),
+        rows=readonly_rows(CountryModel, Country)
+    )
 
-    return {"data": results, "count": total}
+    return {"data": results, "count": total, "next_cursor": next_cursor}
 
 
 def create_country(db: Session, country: CountryAdd):
     db_country = CountryModel(**country.dict())
     db.add(db_country)
     db.commit()
+    invalidate_counts(CountryModel.__tablename__)
     db.refresh(db_country)
+    geo_cache.put(db_country)
     return db_country
 
 
 def get_country(db: Session, country_id: int):
-    country = get_country_by_id(db, country_id)
+    country = geo_cache.get(db, "countries", country_id) if GEO_CACHE else get_country_by_id(db, country_id)
     if not country:
         raise HTTPException(status_code=404, detail="Country not found")
     return country
 
 
-# async def get_all_countries_from_db(db: Session):
-#     return db.query(CountryModel).filter(CountryModel.is_deleted == False).all()
+def get_all_countries(db: Session):
+    if GEO_CACHE:
+        return geo_cache.all(db, "countries")
+    return fetch_all(db.query(CountryModel).filter(CountryModel.is_deleted == False), CountryModel, Country)
 
-async def get_all_countries_cached():
-    print("Fetching from DB...")
-    db = next(get_db())
-    try:
-        return db.query(CountryModel).filter(CountryModel.is_deleted == False).all()
-    finally:
-        db.close()
 
-    
+def all_countries_version(db: Session):
+    if GEO_CACHE:
+        return geo_cache.version(db, "countries")
+    return table_versions(db, CountryModel)
+
 
 def update_country(db: Session, country_id: int, name: str):
     db_country = get_country_by_id(db, country_id)
@@ -73,7 +81,9 @@ def update_country(db: Session, country_id: int, name: str):
     db_country.name = name
     db_country.updated_at = now()
     db.commit()
+    invalidate_counts(CountryModel.__tablename__)
     db.refresh(db_country)
+    geo_cache.put(db_country)
     return db_country
 
 
@@ -82,5 +92,8 @@ def delete_country(db: Session, country_id: int):
     if not db_country:
         raise HTTPException(status_code=404, detail="Country not found")
     db_country.is_deleted = True
+    db_country.updated_at = now()
     db.commit()
+    invalidate_counts(CountryModel.__tablename__)
+    geo_cache.put(db_country)
     return db_country
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+from dataclasses import make_dataclass
+from functools import lru_cache
+from operator import itemgetter
+from typing import get_args
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import ColumnProperty, aliased, joinedload, selectinload
+
+load_dotenv()
+
+
+READONLY_ROWS = os.getenv("READONLY_ROWS", "true").lower() == "true"
+
+
+def _nested_schema(annotation):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        nested = _nested_schema(arg)
+        if nested is not None:
+            return nested
+    return None
+
+
+def _options(model, schema, parent=None):
+    relationships = inspect(model).relationships
+    for name, field in schema.model_fields.items():
+        nested = _nested_schema(field.annotation)
+        if nested is None or name not in relationships:
+            continue
+        rel = relationships[name]
+        attr = getattr(model, name)
+        if parent is None:
+            option = selectinload(attr) if rel.uselist else joinedload(attr)
+        else:
+            option = parent.selectinload(attr) if rel.uselist else parent.joinedload(attr)
+        children = list(_options(rel.mapper.class_, nested, option))
+        if children:
+            yield from children
+        else:
+            yield option
+
+
+@lru_cache(maxsize=None)
+def load_options(model, schema):
+    # many-to-one hops are joined into the row, collections get one extra
+    # SELECT ... IN per level, so a page costs the same number of queries
+    # whatever its size
+    return tuple(_options(model, schema))
+
+
+def shape(query, model, schema):
+    return query.options(*load_options(model, schema))
+
+
+class RowLoader:
+    """Selects only the columns ``schema`` reads and builds slotted DTOs from them.
+
+    Nested many-to-one schemas are outer-joined and come back as nested DTOs.
+    Rows never enter the session, so there is no identity map, change
+    tracking or relationship loading to pay for. Schemas that nest a
+    collection are not supported; ``row_loader`` returns None for those.
+    """
+
+    def __init__(self, model, schema):
+        self.columns = []
+        self.joins = []
+        self.build = self._plan(model, model, schema, "", nested=False)
+
+    def _column(self, expression, label):
+        self.columns.append(expression.label(label))
+        return itemgetter(len(self.columns) - 1)
+
+    def _plan(self, model, entity, schema, prefix, nested):
+        mapper = inspect(model)
+        # an outer join that found nothing gives a NULL primary key
+        key = self._column(getattr(entity, mapper.primary_key[0].key), prefix + "pk") if nested else None
+        getters = []
+        for name, field in schema.model_fields.items():
+            child = _nested_schema(field.annotation)
+            if child is None:
+                if not isinstance(mapper.attrs.get(name), ColumnProperty):
+                    raise TypeError(f"{schema.__name__}.{name} is not a column of {model.__name__}")
+                getters.append(self._column(getattr(entity, name), prefix + name))
+                continue
+            rel = mapper.relationships.get(name)
+            if rel is None or rel.uselist:
+                raise TypeError(f"{schema.__name__}.{name} is not a many-to-one relationship")
+            alias = aliased(rel.mapper.class_)
+            self.joins.append(getattr(entity, name).of_type(alias))
+            getters.append(self._plan(rel.mapper.class_, alias, child, f"{prefix}{name}__", nested=True))
+
+        row_class = make_dataclass(f"{schema.__name__}Row", list(schema.model_fields), slots=True)
+
+        def build(row):
+            if key is not None and key(row) is None:
+                return None
+            return row_class(*[get(row) for get in getters])
+
+        return build
+
+    def select(self, query, *extra):
+        query = query.with_entities(*self.columns, *extra)
+        for join in self.joins:
+            query = query.outerjoin(join)
+        return query
+
+    def all(self, query):
+        build = self.build
+        return [build(row) for row in self.select(query)]
+
+
+@lru_cache(maxsize=None)
+def row_loader(model, schema):
+    try:
+        return RowLoader(model, schema)
+    except TypeError:
+        return None
+
+
+def readonly_rows(model, schema):
+    return row_loader(model, schema) if READONLY_ROWS else None
+
+
+def fetch_all(query, model, schema):
+    rows = readonly_rows(model, schema)
+    if rows is None:
+        return shape(query, model, schema).all()
+    return rows.all(query)
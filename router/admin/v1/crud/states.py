@@ -1,15 +1,21 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 
-from models import StateModel
+from models import StateModel, CountryModel
 from libs.utils import now
-from router.admin.v1.schemas import StateAdd
+from libs.pagination import paginate
+from libs.counting import invalidate_counts
+from libs.search import apply_search
+from libs.geo_cache import geo_cache, GEO_CACHE
+from libs.conditional import table_versions
+from router.admin.v1.schemas import StateAdd, State
 from router.admin.v1.crud.countries import get_country_by_id
+from router.admin.v1.crud.loading import shape, load_options, readonly_rows, fetch_all
 
 
 
-def get_state_by_id(db: Session, state_id):
-    state = db.query(StateModel).filter(StateModel.id == state_id, StateModel.is_deleted == False).first()
+def get_state_by_id(db: Session, state_id, options=()):
+    state = db.query(StateModel).options(*options).filter(StateModel.id == state_id, StateModel.is_deleted == False).first()
     return state
 
 
@@ -19,23 +25,26 @@ def get_states(
     limit: int,
     search: str,
     sort_by: str,
-    order: str
+    order: str,
+    cursor: str = None,
+    count: str = "exact"
 ):
-    query = db.query(StateModel).filter(StateModel.is_deleted == False)
-    if search:
-        query = query.filter(
-            StateModel.name.ilike(f"%{search}%")
-        )
+    if GEO_CACHE:
+        return geo_cache.list(db, "states", start, limit, search, sort_by, order, cursor, count)
 
-    if sort_by == "created_at":
-        query = query.order_by(StateModel.created_at.desc() if order == "desc" else StateModel.created_at.asc())
-    elif sort_by == "name":
-        query = query.order_by(StateModel.name.desc() if order == "desc" else StateModel.name.asc())
+    query = shape(db.query(StateModel), StateModel, State).filter(StateModel.is_deleted == False)
+    rank = None
+    if search:
+        query, rank = apply_search(query, StateModel, (StateModel.name,), search)
 
-    total = query.count()
-    results = query.offset(start).limit(limit).all()
+    sort_columns = {"created_at": StateModel.created_at, "name": StateModel.name, "relevance": rank}
+    results, total, next_cursor = paginate(
+        query, StateModel, sort_columns, sort_by, order, start, limit,
+        cursor=cursor, count=count, filtered=bool(search),
+        rows=readonly_rows(StateModel, State)
+    )
 
-    return {"data": results, "count": total}
+    return {"data": results, "count": total, "next_cursor": next_cursor}
 
 
 def create_state(db: Session, state: StateAdd):
@@ -46,19 +55,32 @@ def create_state(db: Session, state: StateAdd):
     db_state = StateModel(**state.dict())
     db.add(db_state)
     db.commit()
+    invalidate_counts(StateModel.__tablename__)
     db.refresh(db_state)
+    geo_cache.put(db_state)
     return db_state
 
 
 def get_state(db: Session, state_id: int):
-    state_obj = get_state_by_id(db, state_id)
+    if GEO_CACHE:
+        state_obj = geo_cache.get(db, "states", state_id)
+    else:
+        state_obj = get_state_by_id(db, state_id, options=load_options(StateModel, State))
     if not state_obj:
         raise HTTPException(status_code= 404, detail= "State Not Found")
     return state_obj
 
 
 def get_all_states(db: Session):
-    return db.query(StateModel).filter(StateModel.is_deleted == False).all()
+    if GEO_CACHE:
+        return geo_cache.all(db, "states")
+    return fetch_all(db.query(StateModel).filter(StateModel.is_deleted == False), StateModel, State)
+
+
+def all_states_version(db: Session):
+    if GEO_CACHE:
+        return geo_cache.version(db, "states", "countries")
+    return table_versions(db, StateModel, CountryModel)
 
 def update_state(db: Session, state_id: int, state: StateAdd):
     db_state = get_state_by_id(db, state_id)
@@ -73,7 +95,9 @@ def update_state(db: Session, state_id: int, state: StateAdd):
     db_state.country_id = state.country_id
     db_state.updated_at = now()
     db.commit()
+    invalidate_counts(StateModel.__tablename__)
     db.refresh(db_state)
+    geo_cache.put(db_state)
     return db_state
 
 
@@ -83,4 +107,6 @@ def delete_state(db: Session, state_id: int):
         db_state.is_deleted = True
         db_state.updated_at = now()
         db.commit()
+        invalidate_counts(StateModel.__tablename__)
+        geo_cache.put(db_state)
     return
\ No newline at end of file
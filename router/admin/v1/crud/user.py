@@ -1,22 +1,68 @@
-import bcrypt
 import os,traceback,json
+import asyncio
+from functools import lru_cache
 
 from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from jwcrypto import jwk, jwt
 from datetime import datetime, timedelta
 from jwcrypto.jwt import JWTExpired
 
 
-from models import UserModel
-from libs.utils import hash_password, now, get_user_by_id, get_user_by_email, object_as_dict,generate_otp,send_email
-from router.admin.v1.schemas import Useradd,UserUpdate,Login,ForgetPassword,ConfirmPassword,ChangePassword,User
-from libs.utils import verify_password, hash_password
+from database import ReadSessionlocal, pin_to_primary
+from models import UserModel, CityModel, StateModel, CountryModel
+from libs.utils import now, get_user_by_id, get_user_by_email, object_as_dict,object_from_dict,generate_otp,send_email
+from libs.principal_cache import principal_cache
+from libs.profiling import PROFILE_USER_IDS
+from router.admin.v1.schemas import Useradd,UserUpdate,ConfirmPassword,User
+from libs.utils import hash_password_async
+from libs.password_pool import password_pool
+from libs.otp_store import otp_store, VALID, EXPIRED, LOCKED
+from libs.pagination import paginate, ordered
+from libs.export import export_query, related, stream_rows
+from libs.counting import invalidate_counts
+from libs.search import apply_search, invalidate_index
+from libs.streaming import iter_records, chunked
 from router.admin.v1.crud.cities import get_city_by_id
+from router.admin.v1.crud.loading import shape, load_options, readonly_rows
 
 load_dotenv()
 
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+# users allowed on the Diagnostics routes (slow queries, stored profiles, pool stats)
+ADMIN_USER_IDS = {int(i) for i in os.getenv("ADMIN_USER_IDS", "").split(",") if i.strip()}
+# models.py's unique index on live emails; MySQL and SQLite both name it in the error
+UNIQUE_EMAIL_INDEX = "uq_users_active_email"
+
+
+EXPORT_COLUMNS = {
+    "id": lambda user: user.id,
+    "name": lambda user: user.name,
+    "email": lambda user: user.email,
+    "dob": lambda user: user.dob,
+    "city_id": lambda user: user.city_id,
+    "city": related("cities", "name"),
+    "state": related("cities", "state", "name"),
+    "country": related("cities", "state", "country", "name"),
+}
+
+
+def filter_users(db: Session, search: str, city_id: int):
+    query = shape(db.query(UserModel), UserModel, User).filter(UserModel.is_deleted == False)
+    rank = None
+    if search:
+        query, rank = apply_search(query, UserModel, (UserModel.name, UserModel.email), search)
+    if city_id:
+        query = query.filter(UserModel.city_id == city_id)
+
+    sort_columns = {"created_at": UserModel.created_at, "name": UserModel.name, "email": UserModel.email, "relevance": rank}
+    return query, sort_columns
 
 
 def get_all_users(
@@ -26,37 +72,48 @@ def get_all_users(
     search: str,
     sort_by: str,
     order: str,
-    city_id: int
+    city_id: int,
+    cursor: str = None,
+    count: str = "exact"
 ):
-    query = db.query(UserModel).filter(UserModel.is_deleted == False)
-    if search:
-        query = query.filter(
-            UserModel.name.ilike(f"%{search}%") |
-            UserModel.email.ilike(f"%{search}%")
-        )
-    if city_id:
-        query = query.filter(UserModel.city_id == city_id)
-    if sort_by == "created_at":
-        query = query.order_by(UserModel.created_at.desc() if order == "desc" else UserModel.created_at.asc())
-    elif sort_by == "name":
-        query = query.order_by(UserModel.name.desc() if order == "desc" else UserModel.name.asc())
-    elif sort_by == "email":
-        query = query.order_by(UserModel.email.desc() if order == "desc" else UserModel.email.asc())
+    query, sort_columns = filter_users(db, search, city_id)
+    results, total, next_cursor = paginate(
+        query, UserModel, sort_columns, sort_by, order, start, limit,
+        cursor=cursor, count=count, filtered=bool(search or city_id),
+        rows=readonly_rows(UserModel, User)
+    )
 
-    total = query.count()
-    results = query.offset(start).limit(limit).all()
+    return {"data": results, "count": total, "next_cursor": next_cursor}
 
-    return {"data": results, "count": total}
+
+def export_users(fmt: str, search: str, sort_by: str, order: str, city_id: int):
+    # Owns its session: the request-scoped one is closed before the body is streamed
+    with ReadSessionlocal() as db:
+        query, sort_columns = filter_users(db, search, city_id)
+        query = ordered(query, UserModel, sort_columns.get(sort_by), order)
+        yield from stream_rows(export_query(query), fmt, User, EXPORT_COLUMNS)
 
 
 def get_user(db: Session, user_id: int):
-    user = get_user_by_id(db, user_id)
+    user = get_user_by_id(db, user_id, options=load_options(UserModel, User))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
-def create_user(db: Session, user: Useradd):
+def user_version(db: Session, user_id: int):
+    row = db.execute(
+        select(UserModel.updated_at, CityModel.updated_at, StateModel.updated_at, CountryModel.updated_at)
+        .select_from(UserModel)
+        .outerjoin(UserModel.cities)
+        .outerjoin(CityModel.state)
+        .outerjoin(StateModel.country)
+        .where(UserModel.id == user_id, UserModel.is_deleted == False)
+    ).first()
+    return None if row is None else tuple(row)
+
+
+def create_user(db: Session, user: Useradd, hashed_password: str):
     existing_user = get_user_by_email(db,user.email)
     if existing_user:
         raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="User already exists")
@@ -69,13 +126,123 @@ def create_user(db: Session, user: Useradd):
         name=user.name,
         email=user.email,
         dob=user.dob,
-        password=hash_password(user.password),
+        password=hashed_password,
         city_id = user.city_id
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    try:
+        db.commit()
+    except IntegrityError:
+        # lost a race with another signup for the same email
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="User already exists")
+    invalidate_counts(UserModel.__tablename__)
+    return get_user_by_id(db, db_user.id, options=load_options(UserModel, User))
+
+
+def _import_error(report: dict, row: int, errors: list):
+    report["failed"] += 1
+    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": row, "errors": errors})
+
+
+def check_import_chunk(db: Session, rows: list, report: dict):
+    emails = {user.email.lower() for _, user in rows}
+    existing = {
+        email.lower() for email in db.scalars(
+            select(UserModel.email).where(UserModel.email.in_(emails), UserModel.is_deleted == False)
+        )
+    }
+    city_ids = set(db.scalars(
+        select(CityModel.id).where(CityModel.id.in_({user.city_id for _, user in rows}), CityModel.is_deleted == False)
+    ))
+
+    accepted, seen = [], set()
+    for row, user in rows:
+        email = user.email.lower()
+        if email in existing or email in seen:
+            _import_error(report, row, ["email: User already exists"])
+        elif user.city_id not in city_ids:
+            _import_error(report, row, ["city_id: City Not Found"])
+        else:
+            seen.add(email)
+            accepted.append((row, user))
+    return accepted
+
+
+def insert_import_chunk(db: Session, rows: list, hashed_passwords: list, report: dict):
+    values = [
+        {
+            "name": user.name,
+            "email": user.email,
+            "dob": user.dob,
+            "password": hashed_password,
+            "city_id": user.city_id,
+        }
+        for (_, user), hashed_password in zip(rows, hashed_passwords)
+    ]
+    try:
+        db.execute(insert(UserModel), values)
+        db.commit()
+        return len(values)
+    except IntegrityError:
+        # an email was taken after check_import_chunk ran (a concurrent signup,
+        # or a case variant the database compares differently); redo the chunk
+        # row by row so only the conflicting rows fail
+        db.rollback()
+
+    created = 0
+    for (row, _), value in zip(rows, values):
+        try:
+            db.execute(insert(UserModel), [value])
+            db.commit()
+            created += 1
+        except IntegrityError as e:
+            db.rollback()
+            # anything else (a city deleted mid-import, a NOT NULL column) is reported as the database put it
+            if UNIQUE_EMAIL_INDEX in str(e.orig):
+                _import_error(report, row, ["email: User already exists"])
+            else:
+                _import_error(report, row, [f"database: {e.orig}"])
+    return created
+
+
+async def import_users(db: Session, stream, content_type: str):
+    report = {"created": 0, "failed": 0, "errors": []}
+    row = 0
+    hashing = asyncio.Semaphore(password_pool.workers * 2)
+
+    async def hash_one(password):
+        async with hashing:
+            return await hash_password_async(password)
+
+    async for chunk in chunked(iter_records(stream, content_type), IMPORT_CHUNK_SIZE):
+        rows = []
+        for record in chunk:
+            row += 1
+            if not isinstance(record, dict):
+                _import_error(report, row, ["Malformed record"])
+                continue
+            try:
+                rows.append((row, Useradd(**record)))
+            except ValidationError as e:
+                _import_error(report, row, [
+                    ".".join(str(part) for part in error["loc"]) + ": " + error["msg"] for error in e.errors()
+                ])
+        if not rows:
+            continue
+
+        accepted = await run_in_threadpool(check_import_chunk, db, rows, report)
+        if not accepted:
+            continue
+        hashed_passwords = await asyncio.gather(*(hash_one(user.password) for _, user in accepted))
+        report["created"] += await run_in_threadpool(insert_import_chunk, db, accepted, hashed_passwords, report)
+
+    if report["created"]:
+        invalidate_counts(UserModel.__tablename__)
+        invalidate_index(UserModel.__tablename__)
+    report["errors"].sort(key=lambda error: error["row"])
+    return report
 
 
 def update_user(db: Session, user_id: int, user: UserUpdate):
@@ -88,8 +255,9 @@ def update_user(db: Session, user_id: int, user: UserUpdate):
     db_user.updated_at = now()
     db_user.city_id = user.city_id
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    principal_cache.invalidate_user(db_user.id)
+    invalidate_counts(UserModel.__tablename__)
+    return get_user_by_id(db, db_user.id, options=load_options(UserModel, User))
 
 
 def delete_user(db: Session, user_id: int):
@@ -99,6 +267,13 @@ def delete_user(db: Session, user_id: int):
     db_user.is_deleted = True
     db_user.updated_at = now()
     db.commit()
+    invalidate_counts(UserModel.__tablename__)
+    principal_cache.invalidate_user(db_user.id)
+
+
+@lru_cache(maxsize=4)
+def load_key(raw_key: str):
+    return jwk.JWK(**json.loads(raw_key))
 
 
 def get_token(user_id: int, email: str):
@@ -107,8 +282,7 @@ def get_token(user_id: int, email: str):
         raise ValueError("JWT_KEY is missing from environment variables")
 
     try:
-        key_dict = json.loads(raw_key)
-        key = jwk.JWK(**key_dict)
+        key = load_key(raw_key)
     except json.JSONDecodeError:
         raise ValueError("Invalid JWT_KEY format. It must be a valid JSON string.")
 
@@ -127,17 +301,22 @@ def verify_token(db: Session, token: str):
     if not token:
         raise HTTPException(status_code=401, detail="Missing token")
 
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return object_from_dict(db, UserModel, cached)
+
     try:
-        key = json.loads(os.getenv("JWT_KEY"))
-        jwk_key = jwk.JWK(**key)
+        jwk_key = load_key(os.getenv("JWT_KEY"))
 
         decoded_token = jwt.JWT(key=jwk_key, jwt=token)
         claims = json.loads(decoded_token.claims)
 
+        pin_to_primary(db)
         db_user = get_user_by_id(db, user_id=claims["id"])
         if db_user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
+        principal_cache.set(token, db_user.id, object_as_dict(db_user), claims.get("exp"))
         return db_user
 
     except JWTExpired as e:
@@ -148,59 +327,65 @@ def verify_token(db: Session, token: str):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def sign_in(db: Session, data: Login):
-    db_user = get_user_by_email(db, data.email)
-    if db_user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    hashed = db_user.password
-    hashed = bytes(hashed, "utf-8")
-    password = bytes(data.password, "utf-8")
-    if not bcrypt.checkpw(password, hashed):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+def verify_admin(db: Session, token: str):
+    user_obj = verify_token(db, token)
+    if user_obj.id not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+    return user_obj
+
+
+def can_profile(token: str):
+    with ReadSessionlocal() as db:
+        try:
+            return verify_token(db, token).id in PROFILE_USER_IDS
+        except HTTPException:
+            return False
+
+
+def login_response(db_user: UserModel):
     user_data = User.from_orm(db_user).dict()
     user_data["access_token"] = get_token(db_user.id, db_user.email)
     return user_data
 
 
-
-def forget_password(db: Session, data: ForgetPassword):
-    user = get_user_by_email(db, data.email)
-    if not user:
+async def send_reset_otp(db_user: UserModel):
+    if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    otp = generate_otp()
-    user.otp = otp
-    user.opt_updated_at = now()
-    db.commit()
 
+    otp = generate_otp()
+    await otp_store.issue(db_user.email, otp)
     send_email(
-        recipient=user.email,
+        recipient=db_user.email,
         subject="Your OTP Code",
         content=f"Your OTP is {otp}"
     )
     return {"message": "OTP sent to your email"}
 
 
-def confirm_forget_password(db: Session, data: ConfirmPassword):
-    user = get_user_by_email(db, data.email)
+async def check_reset_otp(data: ConfirmPassword):
+    result = await otp_store.check(data.email, data.otp)
+    if result == EXPIRED:
+        raise HTTPException(status_code=400, detail="OTP has expired")
+    if result == LOCKED:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many attempts, request a new OTP")
+    if result != VALID:
+        raise HTTPException(status_code=400, detail="Invalid email or OTP")
+
 
-    if not user or user.otp != data.otp:
+def reset_password(db: Session, email: str, hashed_password: str):
+    user = get_user_by_email(db, email)
+    if not user:
         raise HTTPException(status_code=400, detail="Invalid email or OTP")
 
-    if  datetime.now() > user.opt_updated_at + timedelta(minutes=10):
-        raise HTTPException(status_code=400, detail="OTP has expired")
-    
-    user.password = hash_password(data.password)
-    user.otp = None
+    user.password = hashed_password
     db.commit()
+    principal_cache.invalidate_user(user.id)
     return {"message": "Password reset successful"}
 
 
-def change_password(db: Session, data: ChangePassword, user_obj: str):    
-    if not verify_password(data.old_password, user_obj.password):
-        raise HTTPException(status_code=400, detail="Incorrect old password")
-
-    user_obj.password = hash_password(data.new_password)
+def save_password(db: Session, user_obj: UserModel, hashed_password: str):
+    user_obj.password = hashed_password
     db.commit()
+    principal_cache.invalidate_user(user_obj.id)
     db.refresh(user_obj)
     return {"message": "Password update successfull"}
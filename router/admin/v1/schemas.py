@@ -57,7 +57,8 @@ class User(BaseModel):
 
 class UserList(BaseModel):
     data: List[User]
-    count: int
+    count: Optional[int]
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -106,24 +107,27 @@ class CityAdd(BaseModel):
 
 
 class CountryList(BaseModel):
-    count: int
+    count: Optional[int]
     data: List[Country] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
 class StateList(BaseModel):
-    count: int
+    count: Optional[int]
     data: List[State] = []
+    next_cursor: Optional[str] = None
 
     class Config:
         from_attributes = True
 
 
 class CityList(BaseModel):
-    count: int
+    count: Optional[int]
     data: List[City] = []
+    next_cursor: Optional[str] = None
 
     class config:
         from_attributes = True
\ No newline at end of file
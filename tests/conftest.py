@@ -0,0 +1,62 @@
+"""Shared fixtures: a seeded throwaway database, an in-process client and query budgets.
+
+    python -m pytest -q
+
+Seeds a SQLite file from benchmarks.dataset unless DATABASE_URL is set; like
+the benchmarks it drops and recreates the tables it is pointed at.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "tests.db"))
+
+import httpx
+import pytest
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+
+import database
+from benchmarks import dataset
+from benchmarks.routes import Context
+from libs import querycount
+from libs.mail_sink import start_sink
+from libs.mailer import mail_queue
+from main import app
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def ctx():
+    dataset.generate(database.engine, scale=0.1, seed=0, reset=True)
+    FastAPICache.init(InMemoryBackend(), prefix="tests")
+    sink = start_sink(port=int(os.environ["EMAIL_PORT"]))
+    context = Context()
+    try:
+        yield context
+    finally:
+        context.close()
+        mail_queue.shutdown()
+        sink.stop()
+
+
+@pytest.fixture
+async def client(ctx):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://tests") as client:
+        yield client
+
+
+@pytest.fixture
+def query_budget(request):
+    """``with query_budget(n) as stats:`` fails the test when the block runs more than n statements.
+
+    Wraps libs.querycount.query_budget, labelled with the test's name; it also
+    counts statements run by requests the block awaits.
+    """
+    def budget(max_queries: int, label: str = None):
+        return querycount.query_budget(max_queries, label or request.node.name)
+    return budget
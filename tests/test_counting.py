@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+import database
+from libs import counting
+from models import UserModel
+
+
+def counts(names):
+    with database.Sessionlocal() as db:
+        return [
+            counting.cached_count(db.query(UserModel).filter(UserModel.name.like(f"%{name}%")), UserModel)
+            for name in names
+        ]
+
+
+def test_cache_is_bounded_lru(ctx, monkeypatch):
+    monkeypatch.setattr(counting, "_cache", counting.OrderedDict())
+    monkeypatch.setattr(counting, "COUNT_CACHE_SIZE", 2)
+    counts(["a", "b", "a", "c"])
+    # "b" was the least recently used when "c" went in
+    assert [key[2] for key in counting._cache] == [(("name_1", "%a%"),), (("name_1", "%c%"),)]
+
+
+def test_expired_entries_are_evicted(ctx, monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(counting, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(counting, "_cache", counting.OrderedDict())
+    counts(["a", "b"])
+    clock.now += counting.COUNT_CACHE_TTL + 1
+    counts(["c"])
+    assert len(counting._cache) == 1
+    clock.now += counting.COUNT_CACHE_TTL + 1
+    # an expired hit is dropped and counted again
+    counts(["c"])
+    assert [expires_at for expires_at, _ in counting._cache.values()] == [clock.now + counting.COUNT_CACHE_TTL]
@@ -0,0 +1,29 @@
+import pytest
+
+import database
+from libs import profiling
+from router.admin.v1.crud import user
+
+pytestmark = pytest.mark.anyio
+
+ROUTES = [("GET", "/slow-queries"), ("GET", "/profiles"), ("GET", "/pool-stats")]
+
+
+@pytest.fixture
+def user_id(ctx):
+    with database.Sessionlocal() as db:
+        return user.verify_token(db, ctx.headers["token"]).id
+
+
+@pytest.mark.parametrize("method,url", ROUTES)
+async def test_profiling_does_not_grant_admin(method, url, ctx, client, user_id, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_USER_IDS", {user_id})
+    monkeypatch.setattr(user, "PROFILE_USER_IDS", {user_id})
+    monkeypatch.setattr(user, "ADMIN_USER_IDS", set())
+    assert (await client.request(method, url, headers=ctx.headers)).status_code == 403
+
+
+@pytest.mark.parametrize("method,url", ROUTES)
+async def test_admins_can_read_diagnostics(method, url, ctx, client, user_id, monkeypatch):
+    monkeypatch.setattr(user, "ADMIN_USER_IDS", {user_id})
+    assert (await client.request(method, url, headers=ctx.headers)).status_code == 200
@@ -0,0 +1,37 @@
+import pytest
+
+from router.admin.v1.crud import cities, countries, loading, states
+
+pytestmark = pytest.mark.anyio
+
+LISTS = ["/users?limit={}", "/cities?limit={}", "/states?limit={}"]
+ALL = ["/cities/all", "/states/all"]
+
+
+@pytest.fixture(params=[True, False], ids=["rows", "orm"])
+def database_reads(request, monkeypatch):
+    # past the geography cache, through both loaders, so every query reaches the database
+    for module in (cities, countries, states):
+        monkeypatch.setattr(module, "GEO_CACHE", False)
+    monkeypatch.setattr(loading, "READONLY_ROWS", request.param)
+
+
+async def statements(client, ctx, query_budget, url):
+    await client.get(url, headers=ctx.headers)
+    with query_budget(10, url) as stats:
+        response = await client.get(url, headers=ctx.headers)
+    assert response.status_code == 200, response.text
+    return stats
+
+
+@pytest.mark.parametrize("url", LISTS)
+async def test_list_statements_do_not_grow_with_page_size(url, database_reads, ctx, client, query_budget):
+    one = await statements(client, ctx, query_budget, url.format(1))
+    hundred = await statements(client, ctx, query_budget, url.format(100))
+    assert one.count == hundred.count, hundred.shapes
+
+
+@pytest.mark.parametrize("url", LISTS + ALL)
+async def test_no_statement_repeats_per_row(url, database_reads, ctx, client, query_budget):
+    stats = await statements(client, ctx, query_budget, url.format(100))
+    assert max(stats.shapes.values()) == 1, stats.shapes
@@ -0,0 +1,18 @@
+import csv
+import io
+
+import pytest
+
+import models
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_users_without_a_city_export_empty_columns(ctx, client):
+    ctx.insert(models.UserModel, name="Cityless", email="cityless@example.com", password=ctx.hashed_password, city_id=None)
+    params = {"format": "csv", "search": "cityless@example.com"}
+    response = await client.get("/users/export", params=params, headers=ctx.headers)
+    assert response.status_code == 200, response.text
+    [row] = csv.DictReader(io.StringIO(response.text))
+    assert (row["email"], row["city"], row["state"], row["country"]) == ("cityless@example.com", "", "", "")
+
@@ -0,0 +1,30 @@
+import pytest
+
+from router.admin.v1.crud import cities
+
+pytestmark = pytest.mark.anyio
+
+NAMES = ["Qqsort zeta", "qqsort alpha", "QQSORT mid", "qqsort Beta", "Qqsort éclair"]
+
+
+async def walk(client, ctx):
+    names, cursor = [], None
+    while True:
+        params = {"search": "qqsort", "sort_by": "name", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/cities", params=params, headers=ctx.headers)
+        assert response.status_code == 200, response.text
+        names += [city["name"] for city in response.json()["data"]]
+        cursor = response.json()["next_cursor"]
+        if cursor is None:
+            return names
+
+
+async def test_name_cursor_order_matches_database(ctx, client, monkeypatch):
+    for name in NAMES:
+        response = await client.post("/cities", json={"name": name, "state_id": ctx.state_id()}, headers=ctx.headers)
+        assert response.status_code == 200, response.text
+    monkeypatch.setattr(cities, "GEO_CACHE", True)
+    cached = await walk(client, ctx)
+    monkeypatch.setattr(cities, "GEO_CACHE", False)
+    assert sorted(cached) == sorted(NAMES)
+    assert cached == await walk(client, ctx)
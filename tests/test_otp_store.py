@@ -0,0 +1,13 @@
+import pytest
+
+from libs.otp_store import INVALID, VALID, MemoryOTPBackend, OTPStore
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_non_ascii_otp_is_a_wrong_guess():
+    store = OTPStore(ttl=60, max_attempts=5)
+    store.init(MemoryOTPBackend())
+    await store.issue("a@x.com", "123456")
+    assert await store.check("a@x.com", "12345é") == INVALID
+    assert await store.check("a@x.com", "123456") == VALID
@@ -0,0 +1,20 @@
+import pytest
+
+from benchmarks.budgets import BUDGETS
+from benchmarks.routes import ROUTES, route_keys
+
+pytestmark = pytest.mark.anyio
+
+
+def test_every_route_has_a_budget():
+    assert [key for key in route_keys() if key not in BUDGETS] == []
+
+
+@pytest.mark.parametrize("key", route_keys())
+async def test_route_within_budget(key, ctx, client, query_budget):
+    # the first call warms the principal, geography and count caches
+    await client.request(**await ROUTES[key](ctx))
+    request = await ROUTES[key](ctx)
+    with query_budget(BUDGETS[key], key):
+        response = await client.request(**request)
+    assert response.status_code < 400, response.text
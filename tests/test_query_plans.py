@@ -0,0 +1,21 @@
+import pytest
+
+import database
+from benchmarks import plans
+from router.admin.v1.crud import cities, countries, states
+
+
+@pytest.fixture
+def database_reads(monkeypatch):
+    # the geography reads must reach the database to have a plan at all
+    for module in (cities, countries, states):
+        monkeypatch.setattr(module, "GEO_CACHE", False)
+
+
+@pytest.mark.parametrize("name", list(plans.CASES))
+def test_no_full_table_scans(name, ctx, database_reads):
+    with database.engine.connect() as conn:
+        entries = plans.check(conn, name)
+    assert entries, f"{name} ran no SELECT"
+    scans = [(entry["full_scans"], entry["sql"]) for entry in entries if entry["full_scans"]]
+    assert not scans, scans
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import models
+from database import ReplicaSet, RoutingSession, pin_to_primary
+
+
+def seeded(path, name):
+    # one country per file, named after it, so a read shows which database answered
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.CountryModel).values(name=name))
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path):
+    engines = {name: seeded(tmp_path / f"{name}.db", name) for name in ("primary", "replica1", "replica2")}
+    yield engines
+    for engine in engines.values():
+        engine.dispose()
+
+
+def sessions(primary, *replicas):
+    class Session(RoutingSession):
+        pass
+
+    Session.replicas = ReplicaSet(replicas)
+    return (
+        sessionmaker(class_=Session, bind=primary),
+        sessionmaker(class_=Session, bind=primary, info={"replica": True}),
+    )
+
+
+def country(db):
+    return db.scalar(select(models.CountryModel.name).order_by(models.CountryModel.id))
+
+
+def test_read_sessions_go_to_a_replica(databases):
+    Write, Read = sessions(databases["primary"], databases["replica1"])
+    with Write() as db:
+        assert country(db) == "primary"
+    with Read() as db:
+        assert country(db) == "replica1"
+        # the replica is kept for the whole session
+        assert country(db) == "replica1"
+
+
+def test_replicas_take_turns(databases):
+    _, Read = sessions(databases["primary"], databases["replica1"], databases["replica2"])
+    served = []
+    for _ in range(4):
+        with Read() as db:
+            served.append(country(db))
+    assert served == ["replica1", "replica2", "replica1", "replica2"]
+
+
+def test_failing_replica_is_ejected(databases):
+    with databases["replica2"].begin() as conn:
+        conn.exec_driver_sql("DROP TABLE users")
+        conn.exec_driver_sql("DROP TABLE cities")
+        conn.exec_driver_sql("DROP TABLE states")
+        conn.exec_driver_sql("DROP TABLE countries")
+    _, Read = sessions(databases["primary"], databases["replica1"], databases["replica2"])
+    with Read() as db:
+        assert country(db) == "replica1"
+    with Read() as db, pytest.raises(OperationalError):
+        country(db)
+    served = []
+    for _ in range(3):
+        with Read() as db:
+            served.append(country(db))
+    assert served == ["replica1"] * 3
+    assert [replica["healthy"] for replica in Read.class_.replicas.status()] == [True, False]
+
+
+def test_reads_fall_back_to_the_primary_when_every_replica_is_down(databases):
+    _, Read = sessions(databases["primary"], databases["replica1"])
+    Read.class_.replicas.eject(databases["replica1"])
+    with Read() as db:
+        assert country(db) == "primary"
+
+
+def test_a_session_reads_its_own_writes(databases):
+    _, Read = sessions(databases["primary"], databases["replica1"])
+    with Read() as db:
+        assert country(db) == "replica1"
+        db.add(models.CountryModel(name="written"))
+        db.commit()
+        # the flush pinned the session to the primary, which has the new row
+        assert db.scalar(select(models.CountryModel.name).where(models.CountryModel.name == "written")) == "written"
+        assert country(db) == "primary"
+
+
+def test_pin_to_primary(databases):
+    _, Read = sessions(databases["primary"], databases["replica1"])
+    with Read() as db:
+        assert country(db) == "replica1"
+        pin_to_primary(db)
+        assert country(db) == "primary"
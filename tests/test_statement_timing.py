@@ -0,0 +1,16 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import database
+from libs import querycount, slowlog
+
+
+def test_failed_statements_leave_no_start_times(ctx):
+    with database.engine.connect() as conn, querycount.count_queries() as stats:
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("SELECT * FROM no_such_table")
+        assert conn.info["query_started"] == []
+        assert conn.info["slow_query_started"] == []
+        conn.exec_driver_sql("SELECT 1").all()
+        assert conn.info["query_started"] == [] and conn.info["slow_query_started"] == []
+    assert stats.count == 1
@@ -0,0 +1,43 @@
+from datetime import date
+
+import pytest
+
+import database
+from benchmarks import dataset
+from router.admin.v1.crud import user
+from router.admin.v1.schemas import Useradd
+
+
+@pytest.fixture
+def not_null_failure(ctx):
+    # stands in for the non-email integrity errors: a city deleted mid-import, a NOT NULL column
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TRIGGER import_not_null BEFORE INSERT ON users WHEN NEW.name = 'Broken' "
+            "BEGIN SELECT RAISE(ABORT, 'NOT NULL constraint failed: users.name'); END"
+        )
+    try:
+        yield
+    finally:
+        with database.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TRIGGER import_not_null")
+
+
+def row(name, email):
+    return Useradd(name=name, email=email, dob=date(2000, 1, 1), password="secret", city_id=1)
+
+
+def test_only_email_conflicts_are_reported_as_duplicates(ctx, not_null_failure):
+    rows = [
+        (1, row("Taken", dataset.email(1))),
+        (2, row("Broken", "broken@example.com")),
+        (3, row("Fresh", "fresh-import@example.com")),
+    ]
+    report = {"created": 0, "failed": 0, "errors": []}
+    with database.Sessionlocal() as db:
+        created = user.insert_import_chunk(db, rows, ["hash"] * len(rows), report)
+    assert created == 1
+    assert report["errors"] == [
+        {"row": 1, "errors": ["email: User already exists"]},
+        {"row": 2, "errors": ["database: NOT NULL constraint failed: users.name"]},
+    ]